@@ -0,0 +1,103 @@
+"""Benchmark of Prometheus text exposition parsers.
+
+Usage:
+    python benchmarks/bench_exposition_parser.py [metrics.txt ...]
+
+Files are saved exporter pages (e.g. "curl -s localhost:9100/metrics"),
+when none are given, a synthetic cAdvisor-like page is used. The legacy
+parser is the regex-based PrometheusMetricClient.parse_raw it replaced.
+"""
+from __future__ import print_function
+
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from stacklight_tests.clients.prometheus import exposition  # noqa
+
+
+metric_line_regex = (r'(?P<metric_name>[\w\d_]+)'
+                     r'({(?P<metric_meta>.*)})* '
+                     r'(?P<metric_value>.*)')
+
+metric_meta_regex = r'(?P<meta_name>\w*)="(?P<meta_value>[\w\d\_\-]*)"'
+
+
+def legacy_parse_raw(lines):
+    metrics = []
+
+    for line in lines:
+        if line[0] == "#":
+            continue
+
+        result = re.match(metric_line_regex, line)
+        metric = {
+            "name": result.group("metric_name"),
+            "value": result.group("metric_value"),
+            "meta": None,
+        }
+
+        meta = result.group("metric_meta")
+        if meta is not None:
+            metric["meta"] = dict(re.findall(metric_meta_regex, meta))
+
+        metrics.append(metric)
+
+    return metrics
+
+
+def make_page(containers=2000):
+    lines = []
+    for metric in ("container_cpu_usage_seconds_total",
+                   "container_memory_usage_bytes",
+                   "container_network_receive_bytes_total",
+                   "container_fs_reads_total",
+                   "container_tasks_state"):
+        lines.append("# HELP {} Synthetic metric.".format(metric))
+        lines.append("# TYPE {} counter".format(metric))
+        for n in range(containers * 10 // 5):
+            lines.append(
+                '{}{{container_name="app{}",id="/docker/{:064x}",'
+                'image="docker-prod.local/app:1.{}",'
+                'name="k8s_app_pod-{}",namespace="ns{}",'
+                'pod_name="pod-{}"}} {} 1500000000000'.format(
+                    metric, n % 50, n, n % 7, n, n % 10, n, n * 1.5))
+    return "\n".join(lines) + "\n"
+
+
+def load_pages(paths):
+    if not paths:
+        return [("synthetic", make_page())]
+    pages = []
+    for path in paths:
+        with open(path, "rb") as f:
+            pages.append((os.path.basename(path), f.read().decode("utf-8")))
+    return pages
+
+
+def main(paths):
+    repeat = 5
+    for page_name, page in load_pages(paths):
+        lines = page.splitlines()
+        print("\n{} ({} lines, {:.1f} KiB)".format(
+            page_name, len(lines), len(page) / 1024.0))
+        parsers = (
+            ("legacy parse_raw", lambda: legacy_parse_raw(lines)),
+            ("iter_samples", lambda: list(exposition.iter_samples(lines))),
+            ("iter_samples+meta",
+             lambda: list(exposition.iter_samples(lines, {}))),
+        )
+        baseline = None
+        for name, parse in parsers:
+            best = min(timeit.repeat(parse, number=1, repeat=repeat))
+            if baseline is None:
+                baseline = best
+            print("  {:<18} {:8.1f} ms  x{:.2f}".format(
+                name, best * 1000, baseline / best))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,84 @@
+"""Micro-benchmark of available JSON decoders on Prometheus/Grafana payloads.
+
+Usage:
+    python benchmarks/bench_json_codec.py [payload.json ...]
+
+Payload files are raw response bodies (e.g. saved from a cassette), when
+none are given, synthetic ALERTS, series and dashboard payloads are used.
+"""
+from __future__ import print_function
+
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from stacklight_tests.clients import json_codec  # noqa
+
+
+def make_alerts_payload(count=5000):
+    result = [{
+        "metric": {"__name__": "ALERTS", "alertname": "Alert{}".format(n % 97),
+                   "alertstate": "firing", "host": "cmp{:03d}".format(n % 200),
+                   "service": "service{}".format(n % 13),
+                   "severity": "warning"},
+        "value": [1500000000.123, "1"],
+    } for n in range(count)]
+    return {"status": "success",
+            "data": {"resultType": "vector", "result": result}}
+
+
+def make_series_payload(count=20000):
+    data = [{"__name__": "cpu_usage_{}".format(n % 10),
+             "host": "cmp{:03d}".format(n % 200),
+             "cpu": "cpu{}".format(n % 48),
+             "instance": "10.0.0.{}:9126".format(n % 250)}
+            for n in range(count)]
+    return {"status": "success", "data": data}
+
+
+def make_dashboard_payload(rows=40, panels=12):
+    return {"meta": {"slug": "system"}, "dashboard": {"rows": [{
+        "title": "Row {}".format(r),
+        "panels": [{
+            "id": r * panels + p, "title": "Panel {}".format(p),
+            "targets": [{"expr": 'rate(cpu_usage_user{host=~"$host"}[1m])',
+                         "refId": "A", "legendFormat": "{{host}}"}],
+            "gridPos": {"x": p, "y": r, "w": 6, "h": 4},
+        } for p in range(panels)]} for r in range(rows)]}}
+
+
+def load_payloads(paths):
+    if not paths:
+        return [
+            ("alerts", json.dumps(make_alerts_payload()).encode("utf-8")),
+            ("series", json.dumps(make_series_payload()).encode("utf-8")),
+            ("dashboard",
+             json.dumps(make_dashboard_payload()).encode("utf-8")),
+        ]
+    payloads = []
+    for path in paths:
+        with open(path, "rb") as f:
+            payloads.append((os.path.basename(path), f.read()))
+    return payloads
+
+
+def main(paths):
+    repeat = 20
+    print("Selected codec: {}".format(json_codec.name))
+    for payload_name, payload in load_payloads(paths):
+        print("\n{} ({:.1f} KiB)".format(payload_name, len(payload) / 1024.0))
+        baseline = None
+        for name, loads, _ in reversed(json_codec.BACKENDS):
+            best = min(timeit.repeat(lambda: loads(payload),
+                                     number=1, repeat=repeat))
+            if baseline is None:
+                baseline = best
+            print("  {:<12} {:8.2f} ms  x{:.2f}".format(
+                name, best * 1000, baseline / best))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
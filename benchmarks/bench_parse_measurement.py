@@ -0,0 +1,101 @@
+"""Benchmark of metric name extraction from dashboard queries.
+
+Usage:
+    python benchmarks/bench_parse_measurement.py [queries.txt [names.txt]]
+
+Files contain one query (metric name) per line, when not given the
+queries below and ~8k generated metric names are used.
+"""
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from stacklight_tests.clients.prometheus import promql  # noqa
+
+
+DASHBOARD_QUERIES = [
+    'max(openstack_cinder_services{state="down", service="cinder-volume"})',
+    'max(openstack_cinder_services{service="cinder-volume"}) by (state)',
+    'irate(openstack_heat_http_response_times_count{http_status="5xx"}[5m])',
+    'max(haproxy_server_ssl_connections {host=~"$host"}) without(pid) > 0',
+    'max(haproxy_server_connections {host=~"$host"}) without(pid) > 0',
+    'avg by (host) (cpu_usage_idle{host=~"$host"})',
+    '100 - cpu_usage_idle{host="$host", cpu="cpu-total"}',
+    'sum(rate(diskio_read_bytes{host="$host", name=~"$disk"}[1m]))',
+    'mem_used{host="$host"} / on(host) mem_total{host="$host"} * 100',
+    'disk_used_percent{host="$host", path="$mount"}',
+    'rate(net_bytes_recv{host="$host", interface="$interface"}[1m])',
+    'system_load15{host="$host"}',
+    'label_values(system_uptime, host)',
+    'label_values(disk_used_percent{host="$host"}, path)',
+    'count(up{job="telegraf"} == 1)',
+    'sum by (instance) (rate(prometheus_http_request_duration_seconds_count'
+    '{handler="query"}[5m]))',
+    'rabbitmq_queue_messages{host="$host"}',
+    'max(openstack_nova_instances{state="active"}) by (region)',
+    'mysql_wsrep_cluster_size{host="$host"}',
+    'sum(kube_pod_container_status_restarts) by (namespace)',
+]
+
+
+def make_metric_names(count=8000):
+    prefixes = ["cpu", "mem", "disk", "diskio", "net", "system", "mysql",
+                "rabbitmq", "haproxy", "openstack", "kube", "prometheus",
+                "container", "etcd", "influxdb", "elasticsearch"]
+    names = set()
+    n = 0
+    while len(names) < count:
+        names.add("{}_metric_{}".format(prefixes[n % len(prefixes)], n))
+        n += 1
+    for query in DASHBOARD_QUERIES:
+        names.update(list(promql.iter_metric_names(query))[:1])
+    # Prefixes of real names, they are matched by substring scan
+    names.update(["cpu_usage", "mem", "disk_used", "up", "system_load1"])
+    return names
+
+
+def parse_by_substring(query, names):
+    for name in names:
+        if name in query:
+            return name
+
+
+def parse_by_tokens(query, names):
+    for name in promql.iter_metric_names(query):
+        if name in names:
+            return name
+
+
+def read_lines(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def main(args):
+    queries = read_lines(args[0]) if args else DASHBOARD_QUERIES
+    names = set(read_lines(args[1])) if len(args) > 1 else make_metric_names()
+    print("{} queries, {} metric names".format(len(queries), len(names)))
+
+    mismatches = [(query, parse_by_substring(query, names),
+                   parse_by_tokens(query, names)) for query in queries]
+    mismatches = [item for item in mismatches if item[1] != item[2]]
+
+    for name, parse in (("substring scan", parse_by_substring),
+                        ("tokenizer", parse_by_tokens)):
+        best = min(timeit.repeat(
+            lambda: [parse(query, names) for query in queries],
+            number=1, repeat=10))
+        print("  {:<15} {:8.3f} ms per query".format(
+            name, best * 1000 / len(queries)))
+
+    print("\nQueries where substring scan returns other name:")
+    for query, old, new in mismatches:
+        print("  {}\n    substring: {}, tokenizer: {}".format(query, old, new))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
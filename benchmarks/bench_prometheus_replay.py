@@ -0,0 +1,121 @@
+"""Benchmark of Prometheus client against the local replay server.
+
+Usage:
+    python benchmarks/bench_prometheus_replay.py [cassette.jsonl.gz]
+
+Cassette is recorded by running tests with PROMETHEUS_CASSETTE_RECORD set,
+when it is not given, synthetic instant query responses are used.
+PROMETHEUS_REPLAY_LATENCY adds a delay to every response to mimic a remote
+server (0.02 s by default). At the end it checks that concurrent identical
+ALERTS polls are merged into a single request.
+"""
+from __future__ import print_function
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from stacklight_tests.clients.prometheus import alertmanager_client  # noqa
+from stacklight_tests.clients.prometheus import cassette  # noqa
+from stacklight_tests.clients.prometheus import prometheus_client  # noqa
+from stacklight_tests import utils  # noqa
+
+
+def make_cassette(count=200):
+    recorded = cassette.Cassette()
+    for n in range(count):
+        query = 'up{{job="job{}"}}'.format(n)
+        body = json.dumps({"status": "success", "data": {
+            "resultType": "vector",
+            "result": [{"metric": {"__name__": "up", "job": "job{}".format(n),
+                                   "host": "cmp{:03d}".format(host)},
+                        "value": [1500000000.0, "1"]}
+                       for host in range(20)]}})
+        recorded.add("GET", "/api/v1/query", [("query", query)],
+                     cassette.Interaction(200, "application/json",
+                                          body.encode("utf-8")))
+    return recorded
+
+
+def add_alerts(recorded, count=50):
+    """Record ALERTS query response unless the cassette has it."""
+    params = [("query", "ALERTS")]
+    if recorded.find("GET", "/api/v1/query", params) is not None:
+        return
+    body = json.dumps({"status": "success", "data": {
+        "resultType": "vector",
+        "result": [{"metric": {"__name__": "ALERTS",
+                               "alertname": "Alert{}".format(n),
+                               "alertstate": "firing",
+                               "host": "cmp{:03d}".format(n),
+                               "severity": "warning"},
+                    "value": [1500000000.0, "1"]}
+                   for n in range(count)]}})
+    recorded.add("GET", "/api/v1/query", params,
+                 cassette.Interaction(200, "application/json",
+                                      body.encode("utf-8")))
+
+
+def check_alerts_single_flight(url, pollers=20):
+    """Check that identical concurrent ALERTS polls are merged."""
+    client = alertmanager_client.PrometheusQueryAlertClient(
+        url, pool_maxsize=pollers)
+    try:
+        utils.run_concurrently(lambda _: client.list_alerts(),
+                               range(pollers), concurrency=pollers)
+        stats = client.get_single_flight_stats()
+    finally:
+        client.close()
+    print("  {:<24} {executed} executed, {merged} merged".format(
+        "list_alerts x{}".format(pollers), **stats))
+    assert stats["merged"] > 0, "Concurrent ALERTS polls were not merged"
+
+
+def get_recorded_queries(recorded):
+    return [dict(params)["query"]
+            for (method, path, params) in recorded.interactions
+            if path == "/api/v1/query" and "query" in dict(params)]
+
+
+def run(name, func, count):
+    start = time.time()
+    func()
+    elapsed = time.time() - start
+    print("  {:<24} {:8.1f} ms  {:8.1f} queries/s".format(
+        name, elapsed * 1000, count / elapsed))
+
+
+def main(paths):
+    latency = float(os.environ.get("PROMETHEUS_REPLAY_LATENCY", 0.02))
+    recorded = cassette.Cassette.load(paths[0]) if paths else make_cassette()
+    queries = get_recorded_queries(recorded)
+    if not queries:
+        print("No instant queries recorded in the cassette")
+        return
+    add_alerts(recorded)
+
+    server = cassette.ReplayServer(recorded, latency=latency)
+    server.start()
+    try:
+        client = prometheus_client.PrometheusClient(
+            server.url, pool_maxsize=20)
+        print("{} queries, {:.0f} ms latency".format(
+            len(queries), latency * 1000))
+        run("sequential get_query",
+            lambda: [client.get_query(query) for query in queries],
+            len(queries))
+        for concurrency in (4, 10, 20):
+            run("query_many x{}".format(concurrency),
+                lambda: client.query_many(queries, concurrency=concurrency),
+                len(queries))
+        client.close()
+        check_alerts_single_flight(server.url)
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
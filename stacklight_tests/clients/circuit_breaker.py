@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+import urlparse
+
+import requests
+
+from stacklight_tests import custom_exceptions
+from stacklight_tests import settings
+
+
+logger = logging.getLogger(__name__)
+
+CONNECTION_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+
+class CircuitBreaker(object):
+    """Fails calls to the host fast after several connection failures.
+
+    After "failure_threshold" consecutive connection failures the breaker
+    opens and all calls raise BackendUnavailable immediately. Every
+    "reset_timeout" seconds a single probe call is let through
+    (half-open state), its success closes the breaker again. If the probe
+    does not finish within "reset_timeout", another probe is allowed, so
+    a hung request doesn't block the host forever.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, host, failure_threshold, reset_timeout):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started_at = None
+        self._lock = threading.Lock()
+
+    def _before_call(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN:
+                retry_at = self.opened_at + self.reset_timeout
+            else:
+                retry_at = self.probe_started_at + self.reset_timeout
+            retry_in = retry_at - time.time()
+            if retry_in <= 0:
+                logger.info("Probing {} after {} failures".format(
+                    self.host, self.failures))
+                self.state = self.HALF_OPEN
+                self.probe_started_at = time.time()
+                return
+            raise custom_exceptions.BackendUnavailable(
+                host=self.host, failures=self.failures,
+                retry_in=max(0, retry_in))
+
+    def _on_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Backend {} is reachable again".format(
+                    self.host))
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def _on_failure(self):
+        with self._lock:
+            self.failures += 1
+            if (self.state == self.HALF_OPEN or
+                    self.failures >= self.failure_threshold):
+                if self.state != self.OPEN:
+                    logger.warning(
+                        "Backend {} marked as unavailable after {} "
+                        "connection failures".format(
+                            self.host, self.failures))
+                self.state = self.OPEN
+                self.opened_at = time.time()
+
+    def call(self, func):
+        self._before_call()
+        try:
+            result = func()
+        except CONNECTION_ERRORS:
+            self._on_failure()
+            raise
+        except Exception:
+            # Backend has answered, so it is reachable
+            self._on_success()
+            raise
+        self._on_success()
+        return result
+
+
+class CircuitBreakerRegistry(object):
+    def __init__(self, failure_threshold=settings.CIRCUIT_BREAKER_FAILURES,
+                 reset_timeout=settings.CIRCUIT_BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        host = urlparse.urlsplit(url).netloc.rpartition("@")[2]
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(
+                    host, self.failure_threshold, self.reset_timeout)
+            return self._breakers[host]
+
+    def call(self, url, func):
+        return self.get(url).call(func)
+
+    def get_states(self):
+        with self._lock:
+            return {host: breaker.state
+                    for host, breaker in self._breakers.items()}
+
+
+registry = CircuitBreakerRegistry()
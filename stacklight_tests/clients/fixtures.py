@@ -1,3 +1,5 @@
+import logging
+
 import pytest
 
 from stacklight_tests.clients import es_kibana_api
@@ -6,16 +8,50 @@ from stacklight_tests.clients.openstack import client_manager
 from stacklight_tests.clients import influxdb_api
 from stacklight_tests.clients import nagios_api
 from stacklight_tests.clients.prometheus import alertmanager_client
+from stacklight_tests.clients.prometheus import cassette
 from stacklight_tests.clients.prometheus import prometheus_client
+from stacklight_tests import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture(scope="session")
+def prometheus_cassette():
+    """Records or replays Prometheus API traffic if it is requested."""
+    if settings.PROMETHEUS_CASSETTE_REPLAY:
+        server = cassette.ReplayServer(
+            cassette.Cassette.load(settings.PROMETHEUS_CASSETTE_REPLAY),
+            latency=settings.PROMETHEUS_REPLAY_LATENCY)
+        server.start()
+        yield server
+        server.stop()
+    elif settings.PROMETHEUS_CASSETTE_RECORD:
+        recorder = cassette.Recorder()
+        yield recorder
+        recorder.cassette.save(settings.PROMETHEUS_CASSETTE_RECORD)
+    else:
+        yield None
 
 
 @pytest.fixture(scope="session")
-def prometheus_api(prometheus_config):
+def prometheus_api(prometheus_config, prometheus_cassette):
     api_client = prometheus_client.get_prometheus_client_from_config(
         prometheus_config)
+    if prometheus_cassette is not None:
+        prometheus_cassette.attach(api_client)
     return api_client
 
 
+@pytest.fixture(scope="session")
+def prometheus_query_memo():
+    """Memo of query results evaluated at the session start time."""
+    memo = prometheus_client.QueryMemo()
+    yield memo
+    logger.info("Prometheus query memo: {hits} hits, {misses} misses, "
+                "dedup ratio {dedup_ratio:.2f}".format(**memo.get_stats()))
+
+
 @pytest.fixture(scope="session")
 def prometheus_native_alerting(prometheus_config):
     alerting = alertmanager_client.AlertManagerClient(
@@ -27,7 +63,8 @@ def prometheus_native_alerting(prometheus_config):
 
 
 @pytest.fixture(scope="session")
-def prometheus_alerting(prometheus_config, prometheus_native_alerting):
+def prometheus_alerting(prometheus_config, prometheus_native_alerting,
+                        prometheus_cassette):
     if not prometheus_config.get("use_prometheus_query_alert", True):
         alerting = prometheus_native_alerting
     else:
@@ -38,6 +75,8 @@ def prometheus_alerting(prometheus_config, prometheus_native_alerting):
                     prometheus_config["prometheus_server_port"])
             )
         )
+        if prometheus_cassette is not None:
+            prometheus_cassette.attach(alerting)
     return alerting
 
 
@@ -73,6 +112,7 @@ def grafana_client(grafana_config, prometheus_api):
         username=grafana_config["grafana_username"],
         password=grafana_config["grafana_password"],
         datasource=prometheus_api,
+        cache_size=grafana_config.get("response_cache_size", 0),
     )
     return grafana
 
@@ -1,6 +1,8 @@
 import logging
 
 from stacklight_tests.clients import grafana_templates_builder
+from stacklight_tests.clients import http_cache
+from stacklight_tests.clients import json_codec
 from stacklight_tests import utils
 
 
@@ -60,8 +62,13 @@ class Dashboard(object):
 
 
 class GrafanaApi(object):
+    cache_ttls = {
+        "/api/search": 5 * 60,
+        "/api/dashboards/db/": 5 * 60,
+    }
+
     def __init__(self, address, port, username, password, datasource,
-                 tls=False):
+                 tls=False, cache_size=0):
         super(GrafanaApi, self).__init__()
         self.address = address
         self.port = port
@@ -72,6 +79,15 @@ class GrafanaApi(object):
         self.grafana_api_url = "{scheme}://{host}:{port}/api".format(
             scheme=scheme, host=address, port=port)
         self.datasource = datasource
+        self.cache = None
+        if cache_size:
+            self.cache = http_cache.ResponseCache(cache_size,
+                                                  ttls=self.cache_ttls)
+
+    def _cached(self, url, fetch):
+        if self.cache is None:
+            return fetch()
+        return self.cache.get_or_fetch(url, None, fetch)
 
     def get_api_url(self, resource=""):
         return "{}{}".format(self.grafana_api_url, resource)
@@ -88,23 +104,29 @@ class GrafanaApi(object):
 
     def _get_raw_dashboard(self, name):
         dashboard_url = self.get_api_url("/dashboards/db/{}".format(name))
-        response = check_http_get_response(
-            dashboard_url, expected_codes=[], auth=self.auth)
-        if response.status_code == 200:
-            return response
-        else:
-            response.raise_for_status()
+
+        def fetch():
+            response = check_http_get_response(
+                dashboard_url, expected_codes=[], auth=self.auth)
+            if response.status_code == 200:
+                return response
+            else:
+                response.raise_for_status()
+        return self._cached(dashboard_url, fetch)
 
     def get_dashboard(self, name):
         raw_dashboard = self._get_raw_dashboard(name)
         if raw_dashboard:
-            return Dashboard(raw_dashboard.json(),
+            return Dashboard(json_codec.response_json(raw_dashboard),
                              self.datasource)
 
     def get_all_dashboards_names(self):
         search_url = self.get_api_url("/search")
-        result = check_http_get_response(search_url, auth=self.auth)
-        return [dash["uri"].replace("db/", "") for dash in result.json()]
+        result = self._cached(
+            search_url,
+            lambda: check_http_get_response(search_url, auth=self.auth))
+        return [dash["uri"].replace("db/", "")
+                for dash in json_codec.response_json(result)]
 
     def is_dashboard_exists(self, name):
         if self._get_raw_dashboard(name):
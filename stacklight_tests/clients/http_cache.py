@@ -0,0 +1,170 @@
+import collections
+import contextlib
+import logging
+import threading
+import time
+import urlparse
+
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def bypass():
+    """Make all cached GETs in the current thread hit the backend."""
+    previous = is_bypassed()
+    _local.bypass = True
+    try:
+        yield
+    finally:
+        _local.bypass = previous
+
+
+def is_bypassed():
+    return getattr(_local, "bypass", False)
+
+
+class ResponseCache(object):
+    """Bounded LRU cache with per-endpoint TTLs for idempotent GETs.
+
+    Only URLs whose path starts with one of "ttls" keys are cached,
+    everything else is always fetched from the backend.
+    """
+
+    def __init__(self, max_size=128, ttls=None):
+        """
+        :param max_size: max number of stored responses
+        :type max_size: int
+        :param ttls: mapping of URL path prefix to TTL in seconds
+        :type ttls: dict
+        """
+        self.max_size = max_size
+        self.ttls = ttls or {}
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_ttl(self, url):
+        path = urlparse.urlsplit(url).path
+        prefixes = [prefix for prefix in self.ttls if path.startswith(prefix)]
+        if not prefixes:
+            return 0
+        return self.ttls[max(prefixes, key=len)]
+
+    @staticmethod
+    def make_key(url, params=None):
+        if not params:
+            return url, ()
+        if isinstance(params, dict):
+            params = params.items()
+        items = []
+        for name, value in params:
+            if isinstance(value, (list, tuple)):
+                items.extend((name, item) for item in value)
+            else:
+                items.append((name, value))
+        return url, tuple(sorted(items))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            # Move to the end as the most recently used
+            del self._entries[key]
+            self._entries[key] = entry
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + ttl, value)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_or_fetch(self, url, params, fetch, fresh=False):
+        """Return cached value for url and params or store fetch() result.
+
+        :param fresh: skip lookup, but still store the fetched value
+        :type fresh: bool
+        """
+        ttl = self.get_ttl(url)
+        if not ttl:
+            return fetch()
+        key = self.make_key(url, params)
+        if not (fresh or is_bypassed()):
+            value = self.get(key)
+            if value is not None:
+                self.hits += 1
+                logger.debug("Cache hit for {}".format(key))
+                return value
+        self.misses += 1
+        value = fetch()
+        self.set(key, value, ttl)
+        return value
+
+    def get_stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self._entries), "max_size": self.max_size}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Merges identical concurrent calls into the single one.
+
+    The first caller for a key does the actual work, others wait for it
+    and get the same result (or exception).
+    """
+
+    def __init__(self):
+        self.executed = 0
+        self.merged = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fetch):
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.merged += 1
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fetch()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def get_stats(self):
+        return {"executed": self.executed, "merged": self.merged}
@@ -1,22 +1,156 @@
 import logging
+import threading
 import urlparse
 
 import requests
+from requests.packages.urllib3 import connection as urllib3_connection
+from requests.packages.urllib3 import connectionpool
+
+from stacklight_tests.clients import circuit_breaker
+from stacklight_tests.clients import http_cache
+from stacklight_tests.clients import http_stats
+from stacklight_tests.clients import rate_limit
+from stacklight_tests import settings
 
 
 logger = logging.getLogger(__name__)
 
 
+class _CountingConnectionMixin(object):
+    """Connection which reports every TCP connect to its pool.
+
+    urllib3 reopens the same connection object when the server closed
+    its socket, so the number of connection objects is not the number
+    of connects.
+    """
+
+    on_connect = None
+
+    def connect(self):
+        super(_CountingConnectionMixin, self).connect()
+        if self.on_connect is not None:
+            self.on_connect()
+
+
+class _CountingHTTPConnection(_CountingConnectionMixin,
+                              urllib3_connection.HTTPConnection):
+    pass
+
+
+class _CountingHTTPSConnection(_CountingConnectionMixin,
+                               urllib3_connection.HTTPSConnection):
+    pass
+
+
+class _CountingPoolMixin(object):
+    def __init__(self, *args, **kwargs):
+        self.num_connects = 0
+        self._connects_lock = threading.Lock()
+        super(_CountingPoolMixin, self).__init__(*args, **kwargs)
+
+    def _new_conn(self):
+        conn = super(_CountingPoolMixin, self)._new_conn()
+        conn.on_connect = self._count_connect
+        return conn
+
+    def _count_connect(self):
+        with self._connects_lock:
+            self.num_connects += 1
+
+
+class _CountingHTTPConnectionPool(_CountingPoolMixin,
+                                  connectionpool.HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+
+class _CountingHTTPSConnectionPool(_CountingPoolMixin,
+                                   connectionpool.HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+COUNTING_POOL_CLASSES = {
+    "http": _CountingHTTPConnectionPool,
+    "https": _CountingHTTPSConnectionPool,
+}
+
+
+class PooledHTTPAdapter(requests.adapters.HTTPAdapter):
+    """Transport adapter which is able to report connection reuse."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(PooledHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+        self.use_counting_pools()
+
+    def use_counting_pools(self):
+        """Make pool manager count TCP connects of its connections."""
+        self.poolmanager.pool_classes_by_scheme = COUNTING_POOL_CLASSES
+
+    def get_pools_stats(self):
+        opened = 0
+        requests_count = 0
+        pools = self.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += getattr(pool, "num_connects", pool.num_connections)
+            requests_count += pool.num_requests
+        return {
+            "connections_opened": opened,
+            "requests": requests_count,
+            "connections_reused": max(0, requests_count - opened),
+        }
+
+
 class HttpClient(object):
-    def __init__(self, base_url=None, verify=False, user=None, password=None):
+    # Path prefix -> TTL in seconds for GETs served from response cache
+    cache_ttls = {}
+
+    def __init__(self, base_url=None, verify=False, user=None, password=None,
+                 pool_connections=10, pool_maxsize=10, pool_block=False,
+                 cache_size=0):
+        """HTTP client with its own keep-alive session.
+
+        :param pool_connections: number of per-host pools to keep
+        :type pool_connections: int
+        :param pool_maxsize: max number of connections kept open per host
+        :type pool_maxsize: int
+        :param pool_block: whether to wait for a free connection when
+         pool_maxsize connections to the host are already in use
+        :type pool_block: bool
+        :param cache_size: max number of cached GET responses,
+         response cache is disabled by default
+        :type cache_size: int
+        """
         self.base_url = base_url
         self.kwargs = {"verify": verify}
         if user is not None and password is not None:
             self.kwargs.update({"auth": (user, password)})
 
+        self.adapter = PooledHTTPAdapter(pool_connections=pool_connections,
+                                         pool_maxsize=pool_maxsize,
+                                         pool_block=pool_block)
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.single_flight = http_cache.SingleFlight()
+        self.cache = None
+        if cache_size:
+            self.cache = http_cache.ResponseCache(cache_size,
+                                                  ttls=self.cache_ttls)
+
     def set_base_url(self, base_url):
         self.base_url = base_url
 
+    def get_connection_stats(self):
+        return self.adapter.get_pools_stats()
+
+    def get_single_flight_stats(self):
+        return self.single_flight.get_stats()
+
+    def close(self):
+        self.session.close()
+
     def request(self, url, method, headers=None, body=None, **kwargs):
         logger.debug(
             "Sending request to: {}, body: {}, headers: {}, kwargs: {}".format(
@@ -24,20 +158,72 @@ class HttpClient(object):
         if headers is None:
             headers = {'Content-Type': 'application/json'}
 
-        kwargs.update(self.kwargs)
-        r = requests.request(method, urlparse.urljoin(self.base_url, url),
-                             headers=headers, data=body, **kwargs)
+        r = self._send(url, method, headers=headers, body=body, **kwargs)
 
         if not r.ok:
             raise requests.HTTPError(r.content)
         logger.debug(r.content)
         return r.headers, r.content
 
+    def _send(self, url, method, headers=None, body=None, **kwargs):
+        kwargs.update(self.kwargs)
+        kwargs.setdefault("timeout", (settings.HTTP_CONNECT_TIMEOUT, None))
+        full_url = urlparse.urljoin(self.base_url, url)
+
+        def send():
+            with rate_limit.registry.limit(full_url) as queue_wait:
+                return http_stats.recorder.measure(
+                    full_url,
+                    lambda: self.session.request(
+                        method, full_url, headers=headers, data=body,
+                        **kwargs),
+                    queue_wait=queue_wait,
+                    stream=kwargs.get("stream", False))
+
+        return circuit_breaker.registry.call(full_url, send)
+
+    def iter_content(self, url, method="GET", chunk_size=64 * 1024,
+                     headers=None, **kwargs):
+        """Yield response body by chunks without loading it into memory.
+
+        Body is not logged, only its chunks are handed to the caller.
+        Size and latency of the request are recorded when the body is
+        read to the end or the generator is closed.
+        """
+        logger.debug(
+            "Streaming request to: {}, headers: {}, kwargs: {}".format(
+                url, headers, kwargs))
+        r = self._send(url, method, headers=headers, stream=True, **kwargs)
+        size = 0
+        try:
+            if not r.ok:
+                size = len(r.content or b"")
+                raise requests.HTTPError(r.content)
+            for chunk in r.iter_content(chunk_size):
+                size += len(chunk)
+                yield chunk
+        finally:
+            r.close()
+            r.finish_stats(size)
+
     def post(self, url, body=None, **kwargs):
         return self.request(url, "POST", body=body, **kwargs)
 
-    def get(self, url, **kwargs):
-        return self.request(url, "GET", **kwargs)
+    def get(self, url, fresh=False, **kwargs):
+        full_url = urlparse.urljoin(self.base_url, url)
+        params = kwargs.get("params")
+
+        def fetch():
+            if set(kwargs) - {"params"}:
+                # Only plain GETs are considered identical
+                return self.request(url, "GET", **kwargs)
+            return self.single_flight.do(
+                http_cache.ResponseCache.make_key(full_url, params),
+                lambda: self.request(url, "GET", **kwargs))
+
+        if self.cache is None:
+            return fetch()
+        return self.cache.get_or_fetch(full_url, params, fetch, fresh=fresh)
 
     def put(self, url, body=None, **kwargs):
         return self.request(url, "PUT", body=body, **kwargs)
@@ -0,0 +1,197 @@
+import collections
+import json
+import re
+import threading
+import time
+import urlparse
+
+
+# Upper bounds of latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, float("inf"))
+
+PATH_TEMPLATES = (
+    (re.compile(r"^(/api/v1/label/)[^/]+(/values)$"), r"\1{label}\2"),
+    (re.compile(r"^(/api/dashboards/db/)[^/]+$"), r"\1{slug}"),
+    (re.compile(r"^(/api/v1/silence/)[^/]+$"), r"\1{id}"),
+)
+
+_id_segment = re.compile(
+    r"^(\d+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+    r"|[0-9a-f]{16,})$", re.IGNORECASE)
+
+
+def template_path(path):
+    """Replace variable parts of URL path with placeholders."""
+    for regex, replacement in PATH_TEMPLATES:
+        if regex.match(path):
+            return regex.sub(replacement, path)
+    return "/".join("{id}" if _id_segment.match(segment) else segment
+                    for segment in path.split("/"))
+
+
+def get_response_size(response):
+    if not getattr(response, "_content_consumed", True):
+        # Streamed body is not read yet
+        return int(response.headers.get("Content-Length", 0))
+    return len(response.content or b"")
+
+
+class EndpointStats(object):
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.status_codes = collections.Counter()
+        self.bytes = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        # Time spent waiting for rate/concurrency limiters,
+        # it is not included into latency
+        self.queue_wait_sum = 0.0
+        self.queue_wait_max = 0.0
+
+    def add(self, status, latency, size, queue_wait=0.0):
+        self.count += 1
+        self.queue_wait_sum += queue_wait
+        self.queue_wait_max = max(self.queue_wait_max, queue_wait)
+        if status is None or status >= 400:
+            self.errors += 1
+        self.status_codes[str(status)] += 1
+        self.bytes += size
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        for n, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.buckets[n] += 1
+                break
+
+    def merge(self, other):
+        self.count += other.count
+        self.errors += other.errors
+        self.status_codes.update(other.status_codes)
+        self.bytes += other.bytes
+        self.latency_sum += other.latency_sum
+        self.latency_max = max(self.latency_max, other.latency_max)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.queue_wait_sum += other.queue_wait_sum
+        self.queue_wait_max = max(self.queue_wait_max, other.queue_wait_max)
+
+    def quantile(self, q):
+        """Estimate latency quantile as upper bound of histogram bucket."""
+        if not self.count:
+            return 0.0
+        threshold = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += bucket_count
+            if seen >= threshold:
+                return min(bound, self.latency_max)
+        return self.latency_max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "status_codes": dict(self.status_codes),
+            "bytes": self.bytes,
+            "latency_sum": self.latency_sum,
+            "latency_avg": self.latency_sum / self.count if self.count else 0,
+            "latency_p95": self.quantile(0.95),
+            "latency_max": self.latency_max,
+            "latency_buckets": dict(zip(
+                [str(bound) for bound in LATENCY_BUCKETS], self.buckets)),
+            "queue_wait_sum": self.queue_wait_sum,
+            "queue_wait_max": self.queue_wait_max,
+        }
+
+
+class HttpStatsRecorder(object):
+    """Collects HTTP stats per (host, templated path) and per test."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.current = collections.defaultdict(EndpointStats)
+        self.total = collections.defaultdict(EndpointStats)
+        self.per_test = collections.OrderedDict()
+
+    def record(self, url, status, latency, size, queue_wait=0.0):
+        parsed = urlparse.urlsplit(url)
+        key = (parsed.netloc.rpartition("@")[2], template_path(parsed.path))
+        with self._lock:
+            self.current[key].add(status, latency, size, queue_wait)
+            self.total[key].add(status, latency, size, queue_wait)
+
+    def measure(self, url, send, queue_wait=0.0, stream=False):
+        """Call send() and record stats of returned response.
+
+        Body of streamed response is not read yet, so its stats are
+        recorded by "response.finish_stats(size)" call once the body is
+        consumed.
+        """
+        start = time.time()
+        try:
+            response = send()
+        except Exception:
+            self.record(url, None, time.time() - start, 0, queue_wait)
+            raise
+        if stream:
+            response.finish_stats = lambda size: self.record(
+                url, response.status_code, time.time() - start, size,
+                queue_wait)
+        else:
+            self.record(url, response.status_code, time.time() - start,
+                        get_response_size(response), queue_wait)
+        return response
+
+    def finish_test(self, name):
+        """Move stats collected since previous call to the given test."""
+        with self._lock:
+            current, self.current = (
+                self.current, collections.defaultdict(EndpointStats))
+        if current:
+            stats = self.per_test.setdefault(
+                name, collections.defaultdict(EndpointStats))
+            for key, endpoint_stats in current.items():
+                stats[key].merge(endpoint_stats)
+
+    @staticmethod
+    def _endpoints_as_list(stats):
+        return [dict(host=host, path=path, **endpoint_stats.as_dict())
+                for (host, path), endpoint_stats in sorted(stats.items())]
+
+    def as_dict(self):
+        return {
+            "endpoints": self._endpoints_as_list(self.total),
+            "tests": collections.OrderedDict(
+                (name, self._endpoints_as_list(stats))
+                for name, stats in self.per_test.items()),
+        }
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+    def format_table(self):
+        header = ("host", "path", "count", "errors", "avg ms", "p95 ms",
+                  "max ms", "wait ms", "KiB")
+        rows = [header]
+        items = sorted(self.total.items(),
+                       key=lambda item: item[1].latency_sum, reverse=True)
+        for (host, path), stats in items:
+            rows.append((
+                host, path, str(stats.count), str(stats.errors),
+                "{:.1f}".format(1000 * stats.latency_sum / stats.count),
+                "{:.1f}".format(1000 * stats.quantile(0.95)),
+                "{:.1f}".format(1000 * stats.latency_max),
+                "{:.1f}".format(1000 * stats.queue_wait_sum / stats.count),
+                "{:.1f}".format(stats.bytes / 1024.0),
+            ))
+        widths = [max(len(row[n]) for row in rows)
+                  for n in range(len(header))]
+        return ["  ".join(cell.ljust(width)
+                          for cell, width in zip(row, widths))
+                for row in rows]
+
+
+recorder = HttpStatsRecorder()
@@ -4,6 +4,7 @@ import logging
 import re
 import urlparse
 
+from stacklight_tests.clients import json_codec
 from stacklight_tests import custom_exceptions
 from stacklight_tests import utils
 
@@ -54,9 +55,13 @@ class InfluxdbApi(object):
                 "u": self.username,
                 "p": self.password,
                 "q": query})
-        logger.debug(response.json())
+        logger.debug(response.content)
         return response
 
+    def do_influxdb_json_query(self, query, expected_codes=(200,)):
+        return json_codec.response_json(
+            self.do_influxdb_query(query, expected_codes=expected_codes))
+
     def do_query(self, query, **kwargs):
         """Temporary function to do "clean" query and return values themselves.
 
@@ -65,8 +70,8 @@ class InfluxdbApi(object):
         kwargs.pop("regex")
         # TODO(rpromyshlennikov): refactor "do_influxdb_query":
         # rename to "do_query" and do return .json()["results"][0]... as here.
-        return self.do_influxdb_query(
-            query, **kwargs).json()["results"][0]["series"][0]["values"]
+        return self.do_influxdb_json_query(
+            query, **kwargs)["results"][0]["series"][0]["values"]
 
     def check_influxdb_online(self):
         measurements = self.get_all_measurements()
@@ -92,7 +97,7 @@ class InfluxdbApi(object):
             "where hostname = '{host}' and time >= {interval}".format(
                 host=host.hostname, interval=interval)
         )
-        result = self.do_influxdb_query(query=query).json()
+        result = self.do_influxdb_json_query(query=query)
         return result["results"][0]["series"][0]["values"][0][1]
 
     def get_instance_creation_time_metrics(self, time_point=None):
@@ -108,7 +113,7 @@ class InfluxdbApi(object):
             "select value "
             "from openstack_nova_instance_creation_time "
             "where time >= {interval}".format(interval=interval))
-        result = self.do_influxdb_query(query=query).json()["results"][0]
+        result = self.do_influxdb_json_query(query=query)["results"][0]
 
         if result and 'series' in result:
             return result["series"][0]["values"]
@@ -117,8 +122,8 @@ class InfluxdbApi(object):
     def _check_influx_query_last_value(self, query, expected_value):
         def check_status():
             logger.debug("Awaiting value: {}".format(expected_value))
-            output = self.do_influxdb_query(query)
-            result = output.json()['results'][0]
+            output = self.do_influxdb_json_query(query)
+            result = output['results'][0]
             if not result or 'series' not in result:
                 return False
             return result['series'][0]['values'][0][1] == expected_value
@@ -157,8 +162,8 @@ class InfluxdbApi(object):
         try:
             self._check_influx_query_last_value(query.format("last(value)"),
                                                 warning_level)
-            result = self.do_influxdb_query(query.format(
-                "hostname, last(value)")).json()['results'][0]
+            result = self.do_influxdb_json_query(query.format(
+                "hostname, last(value)"))['results'][0]
             host, value = result['series'][0]['values'][0][1:]
             return Result(True, host, value)
         except custom_exceptions.TimeoutError as e:
@@ -168,17 +173,17 @@ class InfluxdbApi(object):
 
     def get_environment_name(self):
         query = "show tag values from cpu_usage_idle with key = host"
-        env_name = self.do_influxdb_query(query=query).json()["results"][0]
+        env_name = self.do_influxdb_json_query(query=query)["results"][0]
         assert env_name
 
     def get_all_measurements(self):
-        measurements = self.do_influxdb_query(
-            query="show measurements").json()["results"][0]
+        measurements = self.do_influxdb_json_query(
+            query="show measurements")["results"][0]
         assert measurements
 
     def get_tag_table_bindings(self, tag_name):
-        tags = (self.do_influxdb_query("SHOW TAG keys")
-                    .json()["results"][0]["series"])
+        tags = (self.do_influxdb_json_query("SHOW TAG keys")
+                ["results"][0]["series"])
         # NOTE(rpromyshlennikov):tag["values"] is a nested list like this:
         # u'values': [[u'environment_label'], [u'hostname'], [u'region']],
         # so it should be flatten
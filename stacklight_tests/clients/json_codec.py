@@ -0,0 +1,56 @@
+import json
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def _load_backends():
+    backends = []
+    try:
+        import orjson
+        backends.append(("orjson", orjson.loads,
+                         lambda obj: orjson.dumps(obj).decode("utf-8")))
+    except ImportError:
+        pass
+    try:
+        import ujson
+        backends.append(("ujson", ujson.loads, ujson.dumps))
+    except ImportError:
+        pass
+    try:
+        import simplejson
+        backends.append(("simplejson", simplejson.loads, simplejson.dumps))
+    except ImportError:
+        pass
+    backends.append(("json", json.loads, json.dumps))
+    return backends
+
+
+# The fastest available codec goes first, stdlib one is the fallback
+BACKENDS = _load_backends()
+name, _loads, _dumps = BACKENDS[0]
+logger.debug("Using {} JSON codec".format(name))
+
+
+def loads(data):
+    """Decode JSON document from bytes or text."""
+    try:
+        return _loads(data)
+    except (ValueError, OverflowError):
+        if _loads is json.loads:
+            raise
+        # Fast decoders are stricter than stdlib one (e.g. in big
+        # integers), so double check before failing
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        return json.loads(data)
+
+
+def dumps(obj):
+    return _dumps(obj)
+
+
+def response_json(response):
+    """Decode body of requests.Response, like response.json() does."""
+    return loads(response.content)
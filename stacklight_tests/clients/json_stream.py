@@ -0,0 +1,98 @@
+import codecs
+import json
+import re
+
+
+_decoder = json.JSONDecoder()
+_whitespace_and_commas = re.compile(r"[\s,]*")
+
+# Consumed part of buffer is dropped only when it is larger than this,
+# to avoid copying the buffer after every decoded item
+_TRIM_THRESHOLD = 64 * 1024
+
+
+class _ChunkReader(object):
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.exhausted = False
+
+    def read(self):
+        for chunk in self._chunks:
+            if isinstance(chunk, bytes):
+                chunk = self._decoder.decode(chunk)
+            if chunk:
+                return chunk
+        self.exhausted = True
+        return self._decoder.decode(b"", final=True)
+
+
+def _string_field(text, name):
+    match = re.search(
+        r'"{}"\s*:\s*("(?:[^"\\]|\\.)*")'.format(re.escape(name)), text)
+    if match is None:
+        return None
+    return json.loads(match.group(1))
+
+
+def iter_array_items(chunks, key, expected=None):
+    """Yield items of JSON array stored under "key" one by one.
+
+    Only the current item is kept in memory, so memory usage does not
+    depend on the size of the whole document.
+    :param chunks: iterable with parts of JSON document (bytes or text)
+    :type chunks: iterable
+    :param key: name of the key with array, first occurrence is used
+    :type key: str
+    :param expected: string fields which must precede the array and have
+     given values, nothing is yielded otherwise
+    :type expected: dict
+    :returns: generator of decoded items
+    :raises: ValueError if document is truncated or malformed
+    """
+    reader = _ChunkReader(chunks)
+    key_regex = re.compile(r'"{}"\s*:\s*\['.format(re.escape(key)))
+
+    buf = u""
+    while True:
+        match = key_regex.search(buf)
+        if match is not None:
+            break
+        if reader.exhausted:
+            return
+        buf += reader.read()
+
+    for name, value in (expected or {}).items():
+        if _string_field(buf[:match.start()], name) != value:
+            return
+
+    buf = buf[match.end():]
+    pos = 0
+    while True:
+        pos = _whitespace_and_commas.match(buf, pos).end()
+        if pos >= len(buf):
+            if reader.exhausted:
+                raise ValueError("Unexpected end of JSON array")
+            buf = buf[pos:] + reader.read()
+            pos = 0
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            item, end = _decoder.raw_decode(buf, pos)
+        except ValueError:
+            if reader.exhausted:
+                raise
+            buf = buf[pos:] + reader.read()
+            pos = 0
+            continue
+        if end >= len(buf) and not reader.exhausted:
+            # Scalar values (e.g. numbers) can be cut by chunk border
+            buf = buf[pos:] + reader.read()
+            pos = 0
+            continue
+        yield item
+        pos = end
+        if pos > _TRIM_THRESHOLD:
+            buf = buf[pos:]
+            pos = 0
@@ -1,18 +1,68 @@
-import json
+import collections
 import logging
+import time
 
 from stacklight_tests.clients import http_client
+from stacklight_tests.clients import json_codec
 from stacklight_tests.clients.prometheus import prometheus_client
+from stacklight_tests import custom_exceptions
 from stacklight_tests import utils
 
 
 logger = logging.getLogger(__name__)
 
 
+class AlertSnapshot(object):
+    """Alerts listed at a moment, indexed by (name, service, host).
+
+    Criteria with name, service and host are a single dict lookup, ones
+    with a name only scan alerts of that name.
+    """
+    index_attrs = ("name", "service", "host")
+
+    def __init__(self, alerts, taken_at=None):
+        self.taken_at = time.time() if taken_at is None else taken_at
+        self.alerts = list(alerts)
+        self._by_key = collections.defaultdict(list)
+        self._by_name = collections.defaultdict(list)
+        for alert in self.alerts:
+            self._by_key[tuple(getattr(alert, attr)
+                               for attr in self.index_attrs)].append(alert)
+            self._by_name[alert.name].append(alert)
+
+    def __len__(self):
+        return len(self.alerts)
+
+    def find(self, **criteria):
+        if all(attr in criteria for attr in self.index_attrs):
+            candidates = self._by_key.get(tuple(
+                criteria[attr] for attr in self.index_attrs), ())
+        elif "name" in criteria:
+            candidates = self._by_name.get(criteria["name"], ())
+        else:
+            candidates = self.alerts
+        return [alert for alert in candidates
+                if alert.is_appropriate(**criteria)]
+
+    def get_status(self, criteria):
+        alerts = self.find(**criteria)
+        if not alerts:
+            return False
+        return alerts[0].is_fired
+
+
+def _as_criteria_key(criteria):
+    if isinstance(criteria, dict):
+        return tuple(sorted(criteria.items()))
+    return tuple(sorted(criteria))
+
+
 class AlertBehaviorMixin(object):
+    def get_alert_snapshot(self):
+        return AlertSnapshot(self.list_alerts())
+
     def get_alert_by_filter(self, **criteria):
-        alerts = [alert for alert in self.list_alerts()
-                  if alert.is_appropriate(**criteria)]
+        alerts = self.get_alert_snapshot().find(**criteria)
         if alerts:
             return alerts[0]
         return None
@@ -35,21 +85,63 @@ class AlertBehaviorMixin(object):
         msg = "Alert status was not changed."
         return utils.wait(check, timeout=timeout, timeout_msg=msg)
 
+    def wait_for_alert_states(self, expectations, interval=5,
+                              timeout=5 * 60):
+        """Wait until every alert gets its expected state.
+
+        All expectations are checked against one alert list per poll,
+        a met expectation is not checked anymore.
+        :param expectations: mapping of criteria to expected "is_fired"
+         value, criteria are tuples of (attribute, value) pairs; list of
+         (criteria dict, expected) pairs is accepted as well
+        :type expectations: dict or list
+        :returns: mapping of criteria to time when the state was observed
+        :rtype: collections.OrderedDict
+        :raises: TimeoutError with expectations which were not met
+        """
+        if isinstance(expectations, dict):
+            expectations = expectations.items()
+        pending = collections.OrderedDict(
+            (_as_criteria_key(criteria), is_fired)
+            for criteria, is_fired in expectations)
+        met_at = collections.OrderedDict()
+
+        def check():
+            snapshot = self.get_alert_snapshot()
+            for criteria, is_fired in list(pending.items()):
+                if snapshot.get_status(dict(criteria)) == is_fired:
+                    del pending[criteria]
+                    met_at[criteria] = snapshot.taken_at
+                    logger.debug("Alert {} is{} fired at {}.".format(
+                        dict(criteria), "" if is_fired else " not",
+                        snapshot.taken_at))
+            return not pending
+
+        try:
+            utils.wait(check, interval=interval, timeout=timeout)
+        except custom_exceptions.TimeoutError:
+            raise custom_exceptions.TimeoutError(
+                "Alert states were not changed: {}".format(
+                    ["{} is{} fired".format(dict(criteria),
+                                            "" if is_fired else " not")
+                     for criteria, is_fired in pending.items()]))
+        return met_at
+
 
 class AlertManagerClient(AlertBehaviorMixin, http_client.HttpClient):
     def get_status(self):
         _, resp = self.get("/api/v1/status")
-        status = json.loads(resp)
+        status = json_codec.loads(resp)
         return status["data"]
 
     def list_alert_groups(self):
         _, resp = self.get("/api/v1/alerts/groups")
-        status = json.loads(resp)
+        status = json_codec.loads(resp)
         return status["data"]
 
     def list_alerts(self):
         _, resp = self.get("/api/v1/alerts")
-        status = json.loads(resp)
+        status = json_codec.loads(resp)
         return [get_alert_from_alert_manager_dict(item)
                 for item in status["data"]]
 
@@ -58,7 +150,7 @@ class AlertManagerClient(AlertBehaviorMixin, http_client.HttpClient):
 
     def list_silences(self):
         _, resp = self.get("/api/v1/silences")
-        status = json.loads(resp)
+        status = json_codec.loads(resp)
         return status["data"]
 
     # def add_silence(self):
@@ -76,9 +168,8 @@ class PrometheusQueryAlertClient(AlertBehaviorMixin,
     @staticmethod
     def _remove_pending_alerts(data):
         """Clean from pending alerts."""
-        data = [item for item in data
-                if item["metric"]["alertstate"] == "firing"]
-        return data
+        return (item for item in data
+                if item["metric"]["alertstate"] == "firing")
 
     @staticmethod
     def _merge_duplicates(alerts):
@@ -102,7 +193,9 @@ class PrometheusQueryAlertClient(AlertBehaviorMixin,
         return unique_alerts.values()
 
     def list_alerts(self):
-        data = self.get_query("ALERTS")
+        # Concurrent waiters poll the same query, get() merges their
+        # requests into one
+        data = self.get_query("ALERTS") or []
         data = self._remove_pending_alerts(data)
         alerts = [get_alert_from_query_dict(item) for item in data]
         alerts = self._merge_duplicates(alerts)
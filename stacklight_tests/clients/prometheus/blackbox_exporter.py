@@ -1,8 +1,73 @@
+import collections
+
+import six
+
 from stacklight_tests.clients import http_client
+from stacklight_tests.clients.prometheus import exposition
+from stacklight_tests import utils
+
+
+ProbeResult = collections.namedtuple(
+    "ProbeResult", ("target", "module", "success", "duration", "phases",
+                    "status_code", "error"))
+
+
+def parse_probe(target, module, lines):
+    """Build ProbeResult from the probe metrics page.
+
+    Phase timings are taken from "phase" label of any
+    probe_*_duration_seconds metric (e.g. resolve, connect, tls,
+    processing and transfer of http probes).
+    """
+    success = False
+    duration = None
+    status_code = None
+    phases = collections.OrderedDict()
+    for sample in exposition.iter_samples(lines):
+        if sample.name == "probe_success":
+            success = sample.value == 1
+        elif sample.name == "probe_duration_seconds":
+            duration = sample.value
+        elif sample.name == "probe_http_status_code":
+            status_code = int(sample.value)
+        elif (sample.name.startswith("probe_") and
+              sample.name.endswith("_duration_seconds")):
+            phase = dict(sample.labels).get("phase")
+            if phase is not None:
+                # Redirects report the same phases once per request
+                phases[phase] = phases.get(phase, 0.0) + sample.value
+        elif sample.name == "probe_dns_lookup_time_seconds":
+            phases.setdefault("resolve", sample.value)
+    return ProbeResult(target, module, success, duration, phases,
+                       status_code, None)
+
+
+def slowest_probes(results, limit=10):
+    """Return up to "limit" successful probes, the slowest first."""
+    probes = [result for result in results
+              if result.success and result.duration is not None]
+    probes.sort(key=lambda result: result.duration, reverse=True)
+    return probes[:limit]
+
+
+def summarize_probes(results, limit=10):
+    """Return availability and latency summary of a probe sweep.
+
+    :rtype: dict
+    """
+    results = list(results)
+    return {
+        "total": len(results),
+        "failed": [(result.target, result.module, result.error)
+                   for result in results if not result.success],
+        "slowest": [(result.target, result.module, result.duration,
+                     dict(result.phases))
+                    for result in slowest_probes(results, limit)],
+    }
 
 
 class BlackBoxExporterClient(http_client.HttpClient):
-    def get_probe(self, target, module="http_2xx"):
+    def _get_raw_probe(self, target, module):
 
         params = {
             "module": module,
@@ -11,4 +76,38 @@ class BlackBoxExporterClient(http_client.HttpClient):
 
         _, result = self.get("/probe", params=params)
 
-        return result.splitlines()
+        return result
+
+    def get_probe(self, target, module="http_2xx"):
+        return self._get_raw_probe(target, module).splitlines()
+
+    def get_probe_result(self, target, module="http_2xx"):
+        result = self._get_raw_probe(target, module)
+        return parse_probe(target, module, exposition.iter_lines([result]))
+
+    def probe_many(self, targets, modules="http_2xx", concurrency=10):
+        """Probe every target with every module concurrently.
+
+        Keep "concurrency" not greater than client "pool_maxsize",
+        otherwise extra connections will not be reused.
+        :param targets: targets to probe, e.g. API endpoint URLs
+        :type targets: list
+        :param modules: blackbox exporter module name or list of them
+        :type modules: str or list
+        :param concurrency: max number of probes in flight
+        :type concurrency: int
+        :returns: list of ProbeResult in the order of targets and modules,
+         failed requests are reported as unsuccessful probes with error
+        :rtype: list
+        """
+        if isinstance(modules, six.string_types):
+            modules = [modules]
+        probes = [(target, module) for target in targets
+                  for module in modules]
+        results = utils.run_concurrently(
+            lambda probe: self.get_probe_result(*probe), probes,
+            concurrency=concurrency)
+        return [res.result if res.error is None else
+                ProbeResult(target, module, False, None, {}, None,
+                            str(res.error))
+                for (target, module), res in zip(probes, results)]
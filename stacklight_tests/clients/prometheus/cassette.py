@@ -0,0 +1,215 @@
+from __future__ import print_function
+
+import argparse
+import collections
+import gzip
+import json
+import logging
+import threading
+import time
+import urlparse
+
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+
+
+logger = logging.getLogger(__name__)
+
+# Parameters which depend on the time of run, they are not used
+# to match replayed requests
+VOLATILE_PARAMS = ("time", "start", "end")
+
+Interaction = collections.namedtuple(
+    "Interaction", ("status", "content_type", "body"))
+
+
+def make_key(method, path, params, ignored_params=VOLATILE_PARAMS):
+    return (method.upper(), path,
+            tuple(sorted((name, value) for name, value in params
+                         if name not in ignored_params)))
+
+
+class Cassette(object):
+    """Recorded HTTP interactions stored as gzipped JSON lines."""
+
+    def __init__(self):
+        self.interactions = collections.OrderedDict()
+        self._replay_positions = collections.defaultdict(int)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(items) for items in self.interactions.values())
+
+    def add(self, method, path, params, interaction):
+        key = make_key(method, path, params)
+        with self._lock:
+            self.interactions.setdefault(key, []).append(interaction)
+
+    def find(self, method, path, params):
+        """Return next recorded interaction for the request.
+
+        Repeated requests get recorded responses in the same order,
+        the last one is returned when they are over.
+        """
+        key = make_key(method, path, params)
+        with self._lock:
+            items = self.interactions.get(key)
+            if not items:
+                return None
+            position = self._replay_positions[key]
+            self._replay_positions[key] = position + 1
+            return items[min(position, len(items) - 1)]
+
+    def save(self, path):
+        with gzip.open(path, "wb") as f:
+            for (method, url_path, params), items in self.interactions.items():
+                for item in items:
+                    line = json.dumps({
+                        "method": method, "path": url_path,
+                        "params": params, "status": item.status,
+                        "content_type": item.content_type,
+                        "body": item.body.decode("utf-8"),
+                    }, separators=(",", ":"))
+                    f.write(line.encode("utf-8") + b"\n")
+        logger.info("Saved {} interactions to {}".format(len(self), path))
+
+    @classmethod
+    def load(cls, path):
+        cassette = cls()
+        with gzip.open(path, "rb") as f:
+            for line in f:
+                item = json.loads(line.decode("utf-8"))
+                cassette.add(item["method"], item["path"], item["params"],
+                             Interaction(item["status"], item["content_type"],
+                                         item["body"].encode("utf-8")))
+        return cassette
+
+
+class Recorder(object):
+    """Records responses of HTTP clients into a cassette."""
+
+    def __init__(self, cassette=None,
+                 path_prefixes=("/api/v1/", "/federate")):
+        self.cassette = cassette or Cassette()
+        self.path_prefixes = tuple(path_prefixes)
+
+    def attach(self, client):
+        client.session.hooks["response"].append(self._on_response)
+
+    def _on_response(self, response, *args, **kwargs):
+        request = response.request
+        parsed = urlparse.urlsplit(request.url)
+        if not parsed.path.startswith(self.path_prefixes):
+            return
+        params = urlparse.parse_qsl(parsed.query, keep_blank_values=True)
+        if request.method == "POST" and request.body:
+            body = request.body
+            if isinstance(body, bytes):
+                body = body.decode("utf-8")
+            params += urlparse.parse_qsl(body, keep_blank_values=True)
+        self.cassette.add(request.method, parsed.path, params, Interaction(
+            response.status_code,
+            response.headers.get("Content-Type", "application/json"),
+            response.content))
+
+
+class _ReplayHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    # Keep connections open like Prometheus does, so client pooling works
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes, don't let Nagle delay the body
+    disable_nagle_algorithm = True
+
+    def _replay(self):
+        parsed = urlparse.urlsplit(self.path)
+        params = urlparse.parse_qsl(parsed.query, keep_blank_values=True)
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            body = self.rfile.read(length).decode("utf-8")
+            params += urlparse.parse_qsl(body, keep_blank_values=True)
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        interaction = self.server.cassette.find(
+            self.command, parsed.path, params)
+        if interaction is None:
+            interaction = Interaction(404, "application/json", json.dumps({
+                "status": "error", "errorType": "not_recorded",
+                "error": "No recorded response for {} {}".format(
+                    self.command, self.path)}).encode("utf-8"))
+
+        self.send_response(interaction.status)
+        self.send_header("Content-Type", interaction.content_type)
+        self.send_header("Content-Length", str(len(interaction.body)))
+        self.end_headers()
+        self.wfile.write(interaction.body)
+
+    do_GET = _replay
+    do_POST = _replay
+    do_DELETE = _replay
+
+    def log_message(self, fmt, *args):
+        logger.debug("Replay server: " + fmt % args)
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn,
+                           BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    # Default backlog of 5 stalls connects of concurrent benchmarks
+    request_queue_size = 128
+
+
+class ReplayServer(object):
+    """Local HTTP stand-in which answers with recorded responses."""
+
+    def __init__(self, cassette, host="127.0.0.1", port=0, latency=0):
+        """
+        :param cassette: recorded interactions
+        :type cassette: Cassette
+        :param port: port to listen on, random free port by default
+        :type port: int
+        :param latency: delay in seconds added to every response
+        :type latency: float
+        """
+        self.server = _ThreadingHTTPServer((host, port), _ReplayHandler)
+        self.server.cassette = cassette
+        self.server.latency = latency
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return "http://{}:{}/".format(host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info("Replay server started on {}".format(self.url))
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
+
+    def attach(self, client):
+        client.set_base_url(self.url)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve recorded Prometheus API responses.")
+    parser.add_argument("cassette", help="path to recorded cassette")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9090)
+    parser.add_argument("--latency", type=float, default=0,
+                        help="delay in seconds added to every response")
+    args = parser.parse_args()
+
+    server = ReplayServer(Cassette.load(args.cassette), host=args.host,
+                          port=args.port, latency=args.latency)
+    print("Serving {} on {}".format(args.cassette, server.url))
+    server.server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
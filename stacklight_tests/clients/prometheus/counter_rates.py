@@ -0,0 +1,95 @@
+import array
+
+
+# Series of these types are monotonic counters as well
+_COUNTER_SUFFIXES = {
+    "histogram": ("_bucket", "_count", "_sum"),
+    "summary": ("_count", "_sum"),
+}
+
+
+def is_counter(name, metadata):
+    """Check if metric is a counter by its TYPE or by its name.
+
+    Names ending with "_total" are counters if the exporter gives no TYPE.
+    """
+    entry = metadata.get(name)
+    if entry is not None and entry["type"] == "counter":
+        return True
+    for suffix in ("_bucket", "_count", "_sum"):
+        if name.endswith(suffix):
+            base = metadata.get(name[:-len(suffix)])
+            if (base is not None and
+                    suffix in _COUNTER_SUFFIXES.get(base["type"], ())):
+                return True
+    is_untyped = entry is None or entry["type"] in (None, "untyped")
+    return is_untyped and name.endswith("_total")
+
+
+def series_key(sample):
+    return sample.name, tuple(sorted(sample.labels))
+
+
+def _counter_values(samples, metadata):
+    return {series_key(sample): sample.value for sample in samples
+            if is_counter(sample.name, metadata)}
+
+
+class CounterRates(object):
+    """Per-second rates of counters between two scrapes.
+
+    "keys" are (name, sorted label pairs) of series present in both
+    scrapes, "rates" is the float array aligned with them.
+    """
+
+    def __init__(self, first, second, interval, metadata=None):
+        """
+        :param first: samples of the first scrape
+        :type first: iterable
+        :param second: samples of the second scrape
+        :type second: iterable
+        :param interval: seconds between scrapes
+        :type interval: float
+        :param metadata: HELP/TYPE metadata collected by the parser
+        :type metadata: dict
+        """
+        metadata = metadata or {}
+        old = _counter_values(first, metadata)
+        new = _counter_values(second, metadata)
+        self.interval = interval
+        self.keys = [key for key in new if key in old]
+        self.added = [key for key in new if key not in old]
+        self.removed = [key for key in old if key not in new]
+
+        old_values = array.array("d", (old[key] for key in self.keys))
+        new_values = array.array("d", (new[key] for key in self.keys))
+        pairs = list(zip(old_values, new_values))
+        reset_ids = [n for n, (a, b) in enumerate(pairs) if b < a]
+        stalled_ids = [n for n, (a, b) in enumerate(pairs) if b == a]
+        # Counter starts from zero after reset, like rate() in PromQL
+        self.rates = array.array("d", (
+            (b if b < a else b - a) / interval for a, b in pairs))
+        self.reset = [self.keys[n] for n in reset_ids]
+        self.stalled = [self.keys[n] for n in stalled_ids]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def as_dict(self):
+        return dict(zip(self.keys, self.rates))
+
+    def get(self, name, **labels):
+        """Return rates of series of the metric having given labels.
+
+        :returns: mapping of series key to its rate
+        :rtype: dict
+        """
+        items = set(labels.items())
+        return {key: rate for key, rate in zip(self.keys, self.rates)
+                if key[0] == name and items.issubset(key[1])}
+
+    def stalled_metrics(self):
+        """Return names of metrics none of whose series increased."""
+        increased = {key[0] for key, rate in zip(self.keys, self.rates)
+                     if rate > 0}
+        return {key[0] for key in self.stalled} - increased
@@ -0,0 +1,109 @@
+import collections
+import logging
+
+from stacklight_tests.clients.prometheus import exposition
+from stacklight_tests.clients.prometheus import prometheus_metric
+from stacklight_tests import custom_exceptions
+from stacklight_tests import utils
+
+
+logger = logging.getLogger(__name__)
+
+
+class HostMetrics(object):
+    """Metrics scraped from an exporter on a single host.
+
+    Series are stored as sets of sorted label pairs per metric name, so
+    checks of a name or of an exact label set are set lookups.
+    """
+
+    def __init__(self, hostname, samples=()):
+        self.hostname = hostname
+        self.series = collections.defaultdict(set)
+        self.samples_count = 0
+        for sample in samples:
+            self.series[sample.name].add(tuple(sorted(sample.labels)))
+            self.samples_count += 1
+
+    def __contains__(self, metric_name):
+        return metric_name in self.series
+
+    @property
+    def names(self):
+        return set(self.series)
+
+    def has(self, metric_name, **labels):
+        """Check if metric has a series with given labels.
+
+        Exact label set is looked up first, series having extra labels
+        are scanned only if it is not found.
+        """
+        label_sets = self.series.get(metric_name)
+        if not label_sets:
+            return False
+        if not labels:
+            return True
+        items = tuple(sorted(labels.items()))
+        if items in label_sets:
+            return True
+        items = set(items)
+        return any(items.issubset(label_set) for label_set in label_sets)
+
+    def missing(self, metric_names, **labels):
+        """Return metric names which have no series with given labels."""
+        return [name for name in metric_names
+                if not self.has(name, **labels)]
+
+
+def _scrape_via_http(host, port, path):
+    client = prometheus_metric.PrometheusMetricClient(
+        "http://{0}:{1}/".format(host.address, port))
+    try:
+        return list(client.iter_metrics(path=path))
+    finally:
+        client.close()
+
+
+def _scrape_via_ssh(host, port, path):
+    chunks = host.os.transport.iter_http_get(port, path)
+    return list(exposition.iter_samples(exposition.iter_lines(chunks)))
+
+
+def scrape_hosts(hosts, port, path="/metrics", via="http", concurrency=10):
+    """Scrape exporter on every host concurrently.
+
+    :param hosts: hosts to scrape, e.g. objects.Cluster
+    :type hosts: iterable
+    :param port: exporter port
+    :type port: int
+    :param path: URL path of metrics page
+    :type path: str
+    :param via: "http" to connect to host address directly or "ssh" to
+     tunnel the request to the host local interface over its SSH
+     connection
+    :type via: str
+    :param concurrency: max number of hosts scraped simultaneously
+    :type concurrency: int
+    :returns: mapping of short hostname to its metrics
+    :rtype: collections.OrderedDict
+    :raises: ExporterScrapeFailed if any host was not scraped
+    """
+    scrape = {"http": _scrape_via_http, "ssh": _scrape_via_ssh}[via]
+
+    def scrape_host(host):
+        samples = scrape(host, port, path)
+        return HostMetrics(host.hostname, samples)
+
+    hosts = list(hosts)
+    results = utils.run_concurrently(scrape_host, hosts,
+                                     concurrency=concurrency)
+    errors = {host.address: str(res.error)
+              for host, res in zip(hosts, results) if res.error is not None}
+    if errors:
+        raise custom_exceptions.ExporterScrapeFailed(errors=errors)
+    scraped = collections.OrderedDict(
+        (res.result.hostname, res.result) for res in results)
+    logger.debug("Scraped {0} samples from port {1} of {2} hosts".format(
+        sum(metrics.samples_count for metrics in scraped.values()),
+        port, len(scraped)))
+    return scraped
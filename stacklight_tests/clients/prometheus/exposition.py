@@ -0,0 +1,136 @@
+import codecs
+import collections
+
+from six.moves import intern
+
+
+# Labels are a tuple of (name, value) pairs in exposition order
+Sample = collections.namedtuple(
+    "Sample", ("name", "labels", "value", "timestamp"))
+
+_escapes = {"n": "\n", "\\": "\\", '"': '"'}
+
+
+def _unescape(value):
+    chars = []
+    pos = 0
+    while True:
+        backslash = value.find("\\", pos)
+        if backslash < 0 or backslash == len(value) - 1:
+            chars.append(value[pos:])
+            return "".join(chars)
+        chars.append(value[pos:backslash])
+        char = value[backslash + 1]
+        chars.append(_escapes.get(char, "\\" + char))
+        pos = backslash + 2
+
+
+def _find_closing_quote(line, pos):
+    """Return position of the quote closing the value started at pos."""
+    while True:
+        quote = line.find('"', pos)
+        if quote < 0:
+            return -1
+        backslashes = 0
+        while line[quote - 1 - backslashes] == "\\":
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return quote
+        pos = quote + 1
+
+
+def iter_lines(chunks):
+    """Yield text lines of a body given by (bytes or text) chunks."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    tail = u""
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        lines = (tail + chunk).split("\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _parse_comment(line, metadata):
+    parts = line[1:].split(None, 3)
+    if len(parts) < 3 or parts[0] not in ("HELP", "TYPE"):
+        return
+    entry = metadata.setdefault(parts[1], {"type": None, "help": None})
+    if parts[0] == "TYPE":
+        entry["type"] = parts[2]
+    else:
+        entry["help"] = _unescape(" ".join(parts[2:]))
+
+
+def iter_samples(lines, metadata=None):
+    """Yield samples of Prometheus text exposition format.
+
+    Lines are scanned once with plain string operations, label names are
+    interned, so samples of the same metric share them.
+    :param lines: lines of exposition, blank lines are skipped
+    :type lines: iterable
+    :param metadata: dict to store HELP and TYPE of metrics into, as
+     {name: {"type": ..., "help": ...}}, comments are skipped otherwise
+    :type metadata: dict
+    :returns: generator of Sample, timestamps are milliseconds or None
+    :raises: ValueError on malformed sample lines
+    """
+    names = {}
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line[0] == "#":
+            if metadata is not None:
+                _parse_comment(line, metadata)
+            continue
+
+        brace = line.find("{")
+        if brace < 0:
+            name, _, rest = line.partition(" ")
+            labels = ()
+        else:
+            name = line[:brace].rstrip()
+            labels = []
+            pos = brace + 1
+            while True:
+                while line[pos:pos + 1] in (" ", ","):
+                    pos += 1
+                if line[pos:pos + 1] == "}":
+                    pos += 1
+                    break
+                equals = line.find("=", pos)
+                start = line.find('"', equals) + 1
+                if equals < 0 or not start:
+                    raise ValueError(
+                        "Malformed sample line: {}".format(line))
+                label = line[pos:equals].rstrip()
+                end = _find_closing_quote(line, start)
+                if end < 0:
+                    raise ValueError(
+                        "Malformed sample line: {}".format(line))
+                value = line[start:end]
+                if "\\" in value:
+                    value = _unescape(value)
+                label_name = names.get(label)
+                if label_name is None:
+                    label_name = names[label] = intern(str(label))
+                labels.append((label_name, value))
+                pos = end + 1
+            labels = tuple(labels)
+            rest = line[pos:]
+
+        metric_name = names.get(name)
+        if metric_name is None:
+            metric_name = names[name] = intern(str(name))
+        parts = rest.split()
+        try:
+            value = float(parts[0])
+            timestamp = int(parts[1]) if len(parts) > 1 else None
+        except (IndexError, ValueError):
+            raise ValueError("Malformed sample line: {}".format(line))
+        yield Sample(metric_name, labels, value, timestamp)
@@ -0,0 +1,59 @@
+import array
+
+from stacklight_tests.clients.prometheus import series_index
+
+
+class FederatedMetrics(object):
+    """Latest samples pulled from /federate, indexed for local lookups.
+
+    Label values are deduplicated, so thousands of series of the same
+    hosts and jobs share their strings.
+    """
+
+    def __init__(self, samples=()):
+        self.index = series_index.SeriesIndex()
+        self.values = array.array("d")
+        self._strings = {}
+        for sample in samples:
+            self.add(sample)
+
+    def __len__(self):
+        return len(self.index)
+
+    def add(self, sample):
+        # Label names are interned by the parser already
+        strings = self._strings
+        labels = {name: strings.setdefault(value, value)
+                  for name, value in sample.labels}
+        labels["__name__"] = sample.name
+        self.index.add(labels)
+        self.values.append(sample.value)
+
+    def metric_names(self):
+        return self.index.label_values("__name__")
+
+    def has(self, metric_name, **matchers):
+        return self.index.has(__name__=metric_name, **matchers)
+
+    def get_values(self, metric_name, **matchers):
+        """Return (labels, value) pairs of matching series."""
+        return [(self.index.series[series_id], self.values[series_id])
+                for series_id in sorted(self.index.select_ids(
+                    __name__=metric_name, **matchers))]
+
+    def missing_metrics(self, metric_names):
+        """Return metric names which have no series at all."""
+        return set(metric_names) - self.metric_names()
+
+    def missing_series(self, metric_names, by_label="host",
+                       expected_values=None):
+        """Return missing metrics for every value of the label.
+
+        :returns: mapping of label value to set of missing metric names
+        :rtype: dict
+        """
+        found = ((name, value) for name in set(metric_names)
+                 for value in self.index.label_values(
+                     by_label, __name__=name))
+        return series_index.find_missing_by_label(
+            found, metric_names, expected_values)
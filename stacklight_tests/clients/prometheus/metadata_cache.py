@@ -0,0 +1,107 @@
+import collections
+import logging
+import threading
+import time
+
+from stacklight_tests.clients import http_cache
+
+
+logger = logging.getLogger(__name__)
+
+Metadata = collections.namedtuple(
+    "Metadata", ("metric_names", "label_names", "types", "loaded_at"))
+
+
+class MetadataCache(object):
+    """Metric names, label names and metric types of a Prometheus server.
+
+    Only the first lookup waits for the server. When data gets older than
+    "ttl", lookups return it as is and trigger a refresh in a background
+    thread, so tests never block on it.
+    """
+
+    def __init__(self, client, ttl=5 * 60):
+        """
+        :param client: client to load metadata with
+        :type client: PrometheusClient
+        :param ttl: age in seconds after which metadata is refreshed
+        :type ttl: float
+        """
+        self.client = client
+        self.ttl = ttl
+        self.refreshes = 0
+        self.errors = 0
+        self._data = None
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+
+    def _load(self):
+        # Response cache may hold older data than ours
+        with http_cache.bypass():
+            metric_names = frozenset(
+                self.client.get_label_values("__name__"))
+            label_names = frozenset(self.client.get_label_names())
+            types = self.client.get_metadata_types()
+        return Metadata(metric_names, label_names, types, time.time())
+
+    def _refresh(self):
+        try:
+            data = self._load()
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Failed to refresh Prometheus metadata, keep "
+                           "data loaded at {}: {}".format(
+                               self._data.loaded_at, e))
+            return
+        self._data = data
+        self.refreshes += 1
+        logger.debug("Prometheus metadata refreshed: {} metrics, "
+                     "{} labels".format(len(data.metric_names),
+                                        len(data.label_names)))
+
+    def _start_refresh(self):
+        with self._lock:
+            if (self._refresh_thread is not None and
+                    self._refresh_thread.is_alive()):
+                return
+            self._refresh_thread = threading.Thread(target=self._refresh)
+            self._refresh_thread.daemon = True
+            self._refresh_thread.start()
+
+    def get(self):
+        """Return current metadata snapshot.
+
+        :rtype: Metadata
+        """
+        data = self._data
+        if data is None:
+            with self._lock:
+                if self._data is None:
+                    self._data = self._load()
+                    self.refreshes += 1
+                data = self._data
+        elif time.time() - data.loaded_at > self.ttl:
+            self._start_refresh()
+        return data
+
+    def invalidate(self):
+        """Drop metadata, so the next lookup loads it synchronously."""
+        self._data = None
+
+    def metric_names(self):
+        return self.get().metric_names
+
+    def label_names(self):
+        return self.get().label_names
+
+    def metric_type(self, metric_name):
+        """Return type of metric ("counter", "gauge", ...) or None."""
+        return self.get().types.get(metric_name)
+
+    def get_stats(self):
+        data = self._data
+        return {
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "age": time.time() - data.loaded_at if data else None,
+        }
@@ -1,13 +1,122 @@
-import json
+import array
+import collections
+import logging
 import re
+import threading
+import time
+
+import requests
+import six
 
 from stacklight_tests.clients import http_client
+from stacklight_tests.clients import json_codec
+from stacklight_tests.clients import json_stream
+from stacklight_tests.clients.prometheus import exposition
+from stacklight_tests.clients.prometheus import federation
+from stacklight_tests.clients.prometheus import metadata_cache
+from stacklight_tests.clients.prometheus import promql
+from stacklight_tests.clients.prometheus import scrape_health
+from stacklight_tests.clients.prometheus import series_index
+from stacklight_tests.clients import rate_limit
+from stacklight_tests import utils
+
+
+logger = logging.getLogger(__name__)
+
+QueryResult = collections.namedtuple("QueryResult",
+                                     ("query", "result", "error"))
+
+# Columnar samples of a single series, timestamps and values are
+# array.array("d")
+RangeSeries = collections.namedtuple("RangeSeries",
+                                     ("labels", "timestamps", "values"))
+
+_duration_units = {"ms": 0.001, "s": 1, "m": 60, "h": 60 * 60,
+                   "d": 24 * 60 * 60, "w": 7 * 24 * 60 * 60,
+                   "y": 365 * 24 * 60 * 60}
+_duration_part_regex = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h|d|w|y)")
+_duration_regex = re.compile(
+    r"^(?:\d+(?:\.\d+)?(?:ms|s|m|h|d|w|y))+$")
+
+
+def parse_duration(duration):
+    """Convert Prometheus duration (e.g. "30s", "1m30s") to seconds.
+
+    :raises: ValueError if duration is neither a number nor a duration
+    """
+    if isinstance(duration, (int, float)):
+        return float(duration)
+    duration = duration.strip()
+    try:
+        return float(duration)
+    except ValueError:
+        pass
+    if not _duration_regex.match(duration):
+        raise ValueError("Invalid duration: {!r}".format(duration))
+    return sum(float(value) * _duration_units[unit]
+               for value, unit in _duration_part_regex.findall(duration))
+
+
+class QueryMemo(object):
+    """Memo of instant query results evaluated at the pinned time.
+
+    Results are keyed by normalized query and evaluation timestamp, all
+    queries using the memo are evaluated at "timestamp" by default, so
+    memoized and fresh results are the same.
+    """
+
+    def __init__(self, timestamp=None):
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.hits = 0
+        self.misses = 0
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def get_or_fetch(self, query, timestamp, fetch):
+        key = (promql.normalize(query), timestamp)
+        with self._lock:
+            if key in self._results:
+                self.hits += 1
+                return self._results[key]
+            self.misses += 1
+        result = fetch()
+        with self._lock:
+            self._results[key] = result
+        return result
+
+    @property
+    def dedup_ratio(self):
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+    def get_stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "dedup_ratio": self.dedup_ratio}
 
 
 class PrometheusClient(http_client.HttpClient):
-    measurements = None
+    cache_ttls = {
+        "/api/v1/label/": 5 * 60,
+        "/api/v1/labels": 5 * 60,
+        "/api/v1/metadata": 5 * 60,
+        "/api/v1/targets": 30,
+        "/api/v1/alertmanagers": 60,
+    }
+    # Age in seconds after which metadata is refreshed in background
+    metadata_ttl = 5 * 60
+
+    def __init__(self, *args, **kwargs):
+        super(PrometheusClient, self).__init__(*args, **kwargs)
+        self.metadata = metadata_cache.MetadataCache(
+            self, ttl=self.metadata_ttl)
+
+    def get_query(self, query, timestamp=None, memo=None):
+        if memo is not None:
+            if timestamp is None:
+                timestamp = memo.timestamp
+            return memo.get_or_fetch(
+                query, timestamp, lambda: self.get_query(query, timestamp))
 
-    def get_query(self, query, timestamp=None):
         params = {
             "query": query
         }
@@ -17,14 +126,70 @@ class PrometheusClient(http_client.HttpClient):
 
         _, resp = self.get("/api/v1/query", params=params)
 
-        query_result = json.loads(resp)
+        query_result = json_codec.loads(resp)
         if query_result["status"] != "success":
             raise Exception("Failed resp: {}".format(resp))
 
         if query_result["data"]["resultType"] == "vector":
             return query_result["data"]["result"]
 
-    def get_query_range(self, query, start_time, end_time, step):
+    def iter_query(self, query, timestamp=None, chunk_size=64 * 1024):
+        """Yield entries of query result one by one.
+
+        Response is decoded while it is read from the socket, so memory
+        usage does not depend on the number of returned series. Like
+        get_query, only vector results are returned, nothing is yielded
+        for scalar, string or matrix ones.
+        """
+        params = {
+            "query": query
+        }
+
+        if timestamp is not None:
+            params.update({"time": timestamp})
+
+        chunks = self.iter_content("/api/v1/query", params=params,
+                                   chunk_size=chunk_size)
+        return json_stream.iter_array_items(
+            chunks, "result", expected={"resultType": "vector"})
+
+    def query_many(self, queries, concurrency=10, **kwargs):
+        """Run independent queries concurrently.
+
+        Keep "concurrency" not greater than client "pool_maxsize",
+        otherwise extra connections will not be reused.
+        :param queries: queries to pass to "do_query"
+        :type queries: list
+        :param concurrency: max number of requests in flight
+        :type concurrency: int
+        :returns: list of QueryResult in the order of queries
+        :rtype: list
+        """
+        queries = list(queries)
+        results = utils.run_concurrently(
+            lambda query: self.do_query(query, **kwargs),
+            queries, concurrency=concurrency)
+        return [QueryResult(query, res.result, res.error)
+                for query, res in zip(queries, results)]
+
+    # Prometheus rejects range queries returning more points per series
+    max_points_per_series = 11000
+
+    def _split_range(self, start_time, end_time, step):
+        """Split range into step-aligned chunks which fit points limit."""
+        if step <= 0:
+            raise ValueError(
+                "Step must be positive, got {!r}".format(step))
+        chunk_length = (self.max_points_per_series - 1) * step
+        chunks = []
+        chunk_start = start_time
+        while chunk_start <= end_time:
+            chunk_end = min(end_time, chunk_start + chunk_length)
+            chunks.append((chunk_start, chunk_end))
+            chunk_start = chunk_end + step
+        return chunks
+
+    def _get_raw_query_range(self, query, start_time, end_time, step):
         params = {
             "query": query,
             "start": start_time,
@@ -32,29 +197,157 @@ class PrometheusClient(http_client.HttpClient):
             "step": step,
         }
 
-        # TODO: Add proper return
-        return self.get("/api/v1/query_range", params=params)
+        _, resp = self.get("/api/v1/query_range", params=params)
+
+        query_result = json_codec.loads(resp)
+        if query_result["status"] != "success":
+            raise Exception("Failed resp: {}".format(resp))
+        return query_result["data"]["result"]
+
+    def get_query_range(self, query, start_time, end_time, step,
+                        concurrency=4):
+        """Get samples of every series in columnar form.
+
+        Long ranges are split into chunks which are fetched concurrently
+        and stitched back without duplicated samples.
+        :param start_time: unix timestamp of range start
+        :type start_time: float
+        :param end_time: unix timestamp of range end
+        :type end_time: float
+        :param step: step in seconds or as duration string, e.g. "30s"
+        :type step: float or str
+        :returns: mapping of sorted label items tuple to RangeSeries
+        :rtype: dict
+        """
+        start_time, end_time = float(start_time), float(end_time)
+        step = parse_duration(step)
+        chunks = self._split_range(start_time, end_time, step)
+        results = utils.run_concurrently(
+            lambda chunk: self._get_raw_query_range(
+                query, chunk[0], chunk[1], step),
+            chunks, concurrency=concurrency)
+
+        columns = collections.OrderedDict()
+        for chunk_result in results:
+            if chunk_result.error is not None:
+                raise chunk_result.error
+            for item in chunk_result.result:
+                key = tuple(sorted(item["metric"].items()))
+                if key not in columns:
+                    columns[key] = (array.array("d"), array.array("d"))
+                timestamps, values = columns[key]
+                for timestamp, value in item["values"]:
+                    if timestamps and timestamp <= timestamps[-1]:
+                        continue
+                    timestamps.append(timestamp)
+                    values.append(float(value))
+
+        return collections.OrderedDict(
+            (key, RangeSeries(dict(key), timestamps, values))
+            for key, (timestamps, values) in columns.items())
+
+    def iter_series(self, match, start_time=None, end_time=None):
+        """Yield label sets of series matching selectors one by one."""
+        if isinstance(match, six.string_types):
+            match = [match]
+
+        params = {
+            "match[]": match
+        }
+        if start_time is not None:
+            params["start"] = start_time
+        if end_time is not None:
+            params["end"] = end_time
+
+        chunks = self.iter_content("/api/v1/series", params=params)
+        return json_stream.iter_array_items(chunks, "data")
+
+    def get_series(self, match, start_time=None, end_time=None):
+        return list(self.iter_series(match, start_time, end_time))
 
-    def get_series(self, match):
-        if issubclass(list, match):
+    def get_series_index(self, match, start_time=None, end_time=None):
+        """Fetch series once and index them for local lookups.
+
+        :returns: index of label sets of matching series
+        :rtype: series_index.SeriesIndex
+        """
+        return series_index.SeriesIndex(
+            self.iter_series(match, start_time, end_time))
+
+    def federate(self, match, chunk_size=64 * 1024):
+        """Pull the latest samples of all matching series in one request.
+
+        Response is parsed while it is read from the socket, it is never
+        kept in memory as a whole.
+        :param match: series selector or list of them
+        :type match: str or list
+        :rtype: federation.FederatedMetrics
+        """
+        if isinstance(match, six.string_types):
             match = [match]
 
         params = {
             "match[]": match
         }
 
-        # TODO: Add proper return
-        return self.get("/api/v1/series", params=params)
+        chunks = self.iter_content("/federate", params=params,
+                                   chunk_size=chunk_size)
+        return federation.FederatedMetrics(
+            exposition.iter_samples(exposition.iter_lines(chunks)))
+
+    def federate_metrics(self, metric_names, batch_size=200):
+        """Pull the latest samples of given metrics.
+
+        Names are grouped into a few "__name__" regex selectors.
+        """
+        metric_names = sorted(set(metric_names))
+        return self.federate([
+            '{{__name__=~"{}"}}'.format(
+                "|".join(metric_names[i:i + batch_size]))
+            for i in range(0, len(metric_names), batch_size)])
 
     def get_label_values(self, label_name):
         _, resp = self.get("/api/v1/label/{}/values".format(label_name))
-        query_result = json.loads(resp)
+        query_result = json_codec.loads(resp)
         if query_result["status"] != "success":
             raise Exception("Failed resp: {}".format(resp))
         return query_result["data"]
 
+    def get_label_names(self):
+        """Return names of all labels.
+
+        Empty list is returned by Prometheus versions without
+        label names API (before 2.6).
+        """
+        try:
+            _, resp = self.get("/api/v1/labels")
+        except requests.HTTPError as e:
+            logger.debug("Label names API is not available: {}".format(e))
+            return []
+        query_result = json_codec.loads(resp)
+        if query_result["status"] != "success":
+            raise Exception("Failed resp: {}".format(resp))
+        return query_result["data"]
+
+    def get_metadata_types(self):
+        """Return mapping of metric name to its type.
+
+        Empty mapping is returned by Prometheus versions without
+        metadata API.
+        """
+        try:
+            _, resp = self.get("/api/v1/metadata")
+        except requests.HTTPError as e:
+            logger.debug("Metadata API is not available: {}".format(e))
+            return {}
+        query_result = json_codec.loads(resp)
+        if query_result["status"] != "success":
+            raise Exception("Failed resp: {}".format(resp))
+        return {name: items[0]["type"]
+                for name, items in query_result["data"].items() if items}
+
     def delete_series(self, match):
-        if issubclass(list, match):
+        if isinstance(match, six.string_types):
             match = [match]
 
         params = {
@@ -66,29 +359,77 @@ class PrometheusClient(http_client.HttpClient):
     def get_targets(self):
         _, resp = self.get("/api/v1/targets")
 
-        targets = json.loads(resp)
+        targets = json_codec.loads(resp)
         return targets["data"]["activeTargets"]
 
+    def scrape_health(self):
+        """Return scrape state of all active targets as a table.
+
+        :rtype: scrape_health.ScrapeHealth
+        """
+        return scrape_health.ScrapeHealth(self.get_targets())
+
     def get_alertmanagers(self):
         _, resp = self.get("/api/v1/alertmanagers")
 
-        alertmanagers = json.loads(resp)
+        alertmanagers = json_codec.loads(resp)
         return alertmanagers["data"]["activeAlertmanagers"]
 
-    def _do_label_values_query(self, label_values_query):
-        pattern = (r"label_values\("
-                   r"((?P<query>\w*({.*}){0,1}),\s*){0,1}"
-                   r"(?P<label>\w*)\)")
-        m = re.match(pattern, label_values_query)
-        query = m.group("query")
-        label = m.group("label")
+    def _count_series_by(self, metric_names, labels, batch_size=50):
+        """Return label sets which have series for given metric names.
+
+        Names are checked with a few grouped "count by" queries instead of
+        a query per metric.
+        :returns: set of tuples with values of "__name__" and labels
+        :rtype: set
+        """
+        metric_names = sorted(set(metric_names))
+        group_by = ", ".join(("__name__",) + tuple(labels))
+        queries = [
+            'count by ({}) ({{__name__=~"{}"}})'.format(
+                group_by, "|".join(metric_names[i:i + batch_size]))
+            for i in range(0, len(metric_names), batch_size)]
+        found = set()
+        for query_result in self.query_many(queries):
+            if query_result.error is not None:
+                raise query_result.error
+            for item in query_result.result or []:
+                metric = item["metric"]
+                found.add(tuple(metric.get(label, "")
+                                for label in ("__name__",) + tuple(labels)))
+        return found
 
+    def find_missing_metrics(self, metric_names):
+        """Return metric names which have no series at all."""
+        found = {item[0]
+                 for item in self._count_series_by(metric_names, ())}
+        return set(metric_names) - found
+
+    def find_missing_series(self, metric_names, by_label="host",
+                            expected_values=None):
+        """Return missing metrics for every value of the label.
+
+        :param metric_names: metrics which should be present
+        :type metric_names: list
+        :param by_label: label to group series by
+        :type by_label: str
+        :param expected_values: label values to check, all values having
+         at least one of metrics are checked by default
+        :type expected_values: list
+        :returns: mapping of label value to set of missing metric names
+        :rtype: dict
+        """
+        return series_index.find_missing_by_label(
+            self._count_series_by(metric_names, (by_label,)),
+            metric_names, expected_values)
+
+    def _do_label_values_query(self, label, query=None, **kwargs):
         if query is None:
             return self.get_label_values(label)
         return list(
-            {res['metric'][label] for res in self.get_query(query)})
+            {res['metric'][label] for res in self.get_query(query, **kwargs)})
 
-    def _do_query_result_query(self, query, regex=None):
+    def _do_query_result_query(self, query, regex=None, **kwargs):
         def convert_to_human_readable_string(metric):
             metric_string = metric["__name__"] + "{"
             items = ['{}="{}"'.format(name, value)
@@ -97,45 +438,48 @@ class PrometheusClient(http_client.HttpClient):
             metric_string += ",".join(items)
             return metric_string + "}"
 
-        pattern = r"query_result\((?P<query>.*)\)"
-        m = re.match(pattern, query)
-        query = m.group("query")
         result = [convert_to_human_readable_string(entity["metric"])
-                  for entity in self.get_query(query)]
+                  for entity in self.get_query(query, **kwargs)]
         if regex is not None:
             regex = regex.strip("/")
             result = [re.search(regex, item).group(1) for item in result]
         return result
 
     def do_query(self, query, regex=None, **kwargs):
-        if "label_values" in query:
-            return self._do_label_values_query(query)
-        if "query_result" in query:
-            return self._do_query_result_query(query, regex)
+        kind, args = promql.classify(query)
+        if kind == promql.LABEL_VALUES:
+            return self._do_label_values_query(*reversed(args), **kwargs)
+        if kind == promql.QUERY_RESULT:
+            return self._do_query_result_query(args[0], regex, **kwargs)
         return self.get_query(query, **kwargs)
 
     @staticmethod
     def compile_query(query, replaces):
-        for pattern, value in replaces.items():
-            query = query.replace(pattern, value)
-        return query
+        return promql.compile_query(query, replaces)
 
     def get_all_measurements(self):
-        if self.measurements is None:
-            self.measurements = set(self.get_label_values("__name__"))
-            self.measurements.discard("ALERTS")
-        return self.measurements
+        return self.metadata.metric_names() - {"ALERTS"}
 
     def parse_measurement(self, query):
-        for measurement in self.get_all_measurements():
-            if measurement in query:
-                return measurement
+        measurements = self.metadata.metric_names()
+        for name in promql.iter_metric_names(query):
+            if name in measurements and name != "ALERTS":
+                return name
 
 
 def get_prometheus_client_from_config(config):
+    max_concurrency = config.get("max_concurrency")
     api_client = PrometheusClient(
         "http://{0}:{1}/".format(
             config["prometheus_vip"],
-            config["prometheus_server_port"])
+            config["prometheus_server_port"]),
+        pool_maxsize=max(10, max_concurrency or 0),
+        cache_size=config.get("response_cache_size", 0),
+    )
+    rate_limit.registry.configure(
+        api_client.base_url,
+        max_concurrency=max_concurrency,
+        rate=config.get("rate_limit"),
+        burst=config.get("rate_limit_burst"),
     )
     return api_client
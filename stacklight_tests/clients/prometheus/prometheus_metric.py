@@ -1,38 +1,40 @@
-import re
+import time
 
 from stacklight_tests.clients import http_client
+from stacklight_tests.clients.prometheus import counter_rates
+from stacklight_tests.clients.prometheus import exposition
 
 
 class PrometheusMetricClient(http_client.HttpClient):
-    metric_line_regex = (r'(?P<metric_name>[\w\d_]+)'
-                         r'({(?P<metric_meta>.*)})* '
-                         r'(?P<metric_value>.*)')
-
-    metric_meta_regex = r'(?P<meta_name>\w*)="(?P<meta_value>[\w\d\_\-]*)"'
-
-    def parse_raw(self, lines):
-        metrics = []
-
-        for line in lines:
-            if line[0] == "#":
-                continue
-
-            result = re.match(self.metric_line_regex, line)
-            metric = {
-                "name": result.group("metric_name"),
-                "value": result.group("metric_value"),
-                "meta": None,
-            }
-
-            meta = result.group("metric_meta")
-            if meta is not None:
-                metric["meta"] = dict(re.findall(self.metric_meta_regex, meta))
-
-            metrics.append(metric)
-
-        return metrics
+    @staticmethod
+    def parse_raw(lines, metadata=None):
+        """Parse exposition lines into a list of exposition.Sample."""
+        return list(exposition.iter_samples(lines, metadata))
+
+    def iter_metrics(self, metadata=None, path="/metrics",
+                     chunk_size=64 * 1024):
+        """Yield samples while the metrics page is read from the socket."""
+        chunks = self.iter_content(path, chunk_size=chunk_size)
+        return exposition.iter_samples(exposition.iter_lines(chunks),
+                                       metadata)
 
     def get_metrics(self):
-        _, resp = self.get("/metrics")
-
-        return self.parse_raw(resp.splitlines())
+        return list(self.iter_metrics())
+
+    def get_counter_rates(self, interval=10):
+        """Scrape the page twice and compute rates of all counters.
+
+        Prometheus is not involved, rates are computed locally from the
+        exporter output.
+        :param interval: seconds to wait between scrapes
+        :type interval: float
+        :rtype: counter_rates.CounterRates
+        """
+        metadata = {}
+        first = list(self.iter_metrics(metadata))
+        first_time = time.time()
+        time.sleep(interval)
+        second = list(self.iter_metrics(metadata))
+        second_time = time.time()
+        return counter_rates.CounterRates(
+            first, second, second_time - first_time, metadata)
@@ -0,0 +1,189 @@
+import re
+
+
+_token_regex = re.compile(r"""
+    (?P<string>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|`[^`]*`)
+   |(?P<range>\[[^\[\]]*\])
+   |(?P<variable>\$\w+|\$\{[^}]*\}|\[\[[^\]]*\]\])
+   |(?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?(?:ms|[smhdwy])?)
+   |(?P<identifier>[a-zA-Z_:][a-zA-Z0-9_:]*)
+   |(?P<space>\s+)
+   |(?P<punct>.)
+""", re.VERBOSE | re.DOTALL)
+
+# Identifiers followed by parenthesized list of label names
+GROUPING_KEYWORDS = frozenset((
+    "by", "without", "on", "ignoring", "group_left", "group_right"))
+
+AGGREGATIONS = frozenset((
+    "sum", "min", "max", "avg", "stddev", "stdvar", "count", "count_values",
+    "bottomk", "topk", "quantile"))
+
+KEYWORDS = frozenset(("and", "or", "unless", "bool", "offset")).union(
+    GROUPING_KEYWORDS)
+
+
+def tokenize(query):
+    """Split query into (kind, text) tokens, whitespace is dropped."""
+    return [(m.lastgroup, m.group()) for m in _token_regex.finditer(query)
+            if m.lastgroup != "space"]
+
+
+def normalize(query):
+    """Return query with canonical whitespace between tokens."""
+    return " ".join(text for _, text in tokenize(query))
+
+
+def iter_metric_names(query):
+    """Yield identifiers of query which can be metric names.
+
+    Function and keyword names, label names inside of "{...}" matchers and
+    grouping clauses, strings, durations and template variables are
+    skipped.
+    """
+    tokens = tokenize(query)
+    braces_depth = 0
+    skip_group = False
+    for n, (kind, text) in enumerate(tokens):
+        if kind == "punct":
+            if text == "{":
+                braces_depth += 1
+            elif text == "}":
+                braces_depth = max(0, braces_depth - 1)
+            elif text == ")" and skip_group:
+                skip_group = False
+            continue
+        if kind != "identifier" or braces_depth or skip_group:
+            continue
+        next_text = tokens[n + 1][1] if n + 1 < len(tokens) else ""
+        if text in GROUPING_KEYWORDS:
+            skip_group = next_text == "("
+            continue
+        if text in KEYWORDS or next_text == "(":
+            continue
+        if text in AGGREGATIONS and next_text in GROUPING_KEYWORDS:
+            # e.g. "sum by (host) (...)"
+            continue
+        yield text
+
+
+# Grafana templating functions
+LABEL_VALUES = "label_values"
+QUERY_RESULT = "query_result"
+QUERY = "query"
+
+# Compiled templates and classified queries are cached, dashboards
+# compile the same raw queries with many sets of template values
+_CACHE_LIMIT = 10000
+_substitution_regexes = {}
+_templates = {}
+_classified = {}
+
+
+def _cached(cache, key, build):
+    value = cache.get(key)
+    if value is None:
+        if len(cache) >= _CACHE_LIMIT:
+            cache.clear()
+        value = cache[key] = build()
+    return value
+
+
+def _build_substitution_regex(names):
+    patterns = []
+    for name in sorted(names, key=len, reverse=True):
+        pattern = re.escape(name)
+        if re.match(r"\w", name[-1:]):
+            # "$host" must not match the beginning of "$hostname"
+            pattern += r"(?!\w)"
+        patterns.append(pattern)
+    return re.compile("|".join(patterns))
+
+
+class QueryTemplate(object):
+    """Query split once into literal parts and variable names."""
+
+    def __init__(self, query, names):
+        regex = _cached(_substitution_regexes, names,
+                        lambda: _build_substitution_regex(names))
+        # Even items are literals, odd ones are variable names
+        self.parts = []
+        pos = 0
+        for m in regex.finditer(query):
+            self.parts.extend((query[pos:m.start()], m.group()))
+            pos = m.end()
+        self.parts.append(query[pos:])
+
+    def render(self, replaces):
+        parts = self.parts[:]
+        for n in range(1, len(parts), 2):
+            parts[n] = replaces[parts[n]]
+        return "".join(parts)
+
+
+def compile_query(query, replaces):
+    """Substitute all template variables in a single pass.
+
+    The longest variable name wins, so "$host" does not corrupt
+    "$hostname".
+    """
+    if not replaces:
+        return query
+    names = frozenset(replaces)
+    template = _cached(_templates, (query, names),
+                       lambda: QueryTemplate(query, names))
+    return template.render(replaces)
+
+
+def _split_arguments(text):
+    """Split text by commas which are not nested into brackets/strings."""
+    args = []
+    depth = 0
+    pos = 0
+    for m in _token_regex.finditer(text):
+        kind, value = m.lastgroup, m.group()
+        if kind != "punct":
+            continue
+        if value in "({":
+            depth += 1
+        elif value in ")}":
+            depth -= 1
+        elif value == "," and not depth:
+            args.append(text[pos:m.start()].strip())
+            pos = m.end()
+    args.append(text[pos:].strip())
+    return [arg for arg in args if arg]
+
+
+def _classify(query):
+    tokens = [(m.lastgroup, m.group(), m.start(), m.end())
+              for m in _token_regex.finditer(query)
+              if m.lastgroup != "space"]
+    if (len(tokens) >= 3 and tokens[0][1] in (LABEL_VALUES, QUERY_RESULT) and
+            tokens[1][1] == "(" and tokens[-1][1] == ")"):
+        depth = 0
+        for n, (kind, value, _, _) in enumerate(tokens[1:], 1):
+            if kind != "punct":
+                continue
+            if value == "(":
+                depth += 1
+            elif value == ")":
+                depth -= 1
+                if not depth:
+                    break
+        if n == len(tokens) - 1:
+            inner = query[tokens[1][3]:tokens[-1][2]]
+            if tokens[0][1] == QUERY_RESULT:
+                return QUERY_RESULT, (inner.strip(),)
+            return LABEL_VALUES, tuple(_split_arguments(inner))
+    return QUERY, (query,)
+
+
+def classify(query):
+    """Return kind of query and its arguments.
+
+    :returns: tuple of (LABEL_VALUES, ([query,] label)),
+     (QUERY_RESULT, (query,)) or (QUERY, (query,))
+    :rtype: tuple
+    """
+    return _cached(_classified, query, lambda: _classify(query))
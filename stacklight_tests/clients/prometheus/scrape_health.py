@@ -0,0 +1,111 @@
+import array
+import collections
+import math
+
+
+ScrapeTarget = collections.namedtuple(
+    "ScrapeTarget",
+    ("job", "instance", "host", "health", "duration", "error"))
+
+
+def _nearest_rank(sorted_values, q):
+    if not sorted_values:
+        return float("nan")
+    rank = int(math.ceil(q * len(sorted_values))) - 1
+    return sorted_values[min(max(rank, 0), len(sorted_values) - 1)]
+
+
+class ScrapeHealth(object):
+    """Columnar table of scrape targets state.
+
+    Every column is a list (durations are a float array) indexed by target
+    number, group-bys work with precomputed row numbers of each job/host
+    instead of walking the raw targets payload again.
+    """
+
+    def __init__(self, targets):
+        """
+        :param targets: active targets as returned by /api/v1/targets
+        :type targets: list
+        """
+        self.jobs = []
+        self.instances = []
+        self.hosts = []
+        self.health = []
+        self.errors = []
+        durations = array.array("d")
+        self._rows_by_job = collections.defaultdict(list)
+        self._rows_by_host = collections.defaultdict(list)
+        for row, target in enumerate(targets):
+            labels = target.get("labels", {})
+            job = labels.get("job", "")
+            instance = labels.get("instance", "")
+            host = labels.get("host") or instance.rsplit(":", 1)[0]
+            self.jobs.append(job)
+            self.instances.append(instance)
+            self.hosts.append(host)
+            self.health.append(target.get("health", "unknown"))
+            self.errors.append(target.get("lastError", ""))
+            # Older Prometheus versions don't report scrape duration
+            durations.append(float(target.get("lastScrapeDuration", "nan")))
+            self._rows_by_job[job].append(row)
+            self._rows_by_host[host].append(row)
+        self.durations = durations
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def __getitem__(self, row):
+        return ScrapeTarget(self.jobs[row], self.instances[row],
+                            self.hosts[row], self.health[row],
+                            self.durations[row], self.errors[row])
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def _durations_of(self, rows):
+        return sorted(self.durations[row] for row in rows
+                      if not math.isnan(self.durations[row]))
+
+    def duration_quantile_by_job(self, q=0.95):
+        """Return mapping of job to quantile of its scrape durations.
+
+        :param q: quantile, nearest-rank method is used
+        :type q: float
+        :rtype: dict
+        """
+        return {job: _nearest_rank(self._durations_of(rows), q)
+                for job, rows in self._rows_by_job.items()}
+
+    def slowest_jobs(self, limit=10, q=0.95):
+        """Return (job, duration quantile) pairs, the slowest first."""
+        quantiles = [(job, duration) for job, duration
+                     in self.duration_quantile_by_job(q).items()
+                     if not math.isnan(duration)]
+        quantiles.sort(key=lambda item: item[1], reverse=True)
+        return quantiles[:limit]
+
+    def slow_targets(self, threshold):
+        """Return targets whose last scrape took longer than "threshold".
+
+        :param threshold: scrape duration in seconds
+        :type threshold: float
+        """
+        rows = [row for row, duration in enumerate(self.durations)
+                if duration > threshold]
+        return sorted((self[row] for row in rows),
+                      key=lambda target: target.duration, reverse=True)
+
+    def down_instances_by_host(self):
+        """Return mapping of host to its targets which are not up."""
+        down = {}
+        for host, rows in self._rows_by_host.items():
+            targets = [self[row] for row in rows
+                       if self.health[row] != "up"]
+            if targets:
+                down[host] = targets
+        return down
+
+    def count_by_health(self):
+        return collections.Counter(self.health)
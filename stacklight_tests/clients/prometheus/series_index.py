@@ -0,0 +1,87 @@
+import collections
+
+import six
+
+
+def find_missing_by_label(found, metric_names, expected_values=None):
+    """Return missing metrics for every value of a label.
+
+    :param found: (metric name, label value) pairs of existing series
+    :type found: iterable
+    :param metric_names: metrics which should be present
+    :type metric_names: list
+    :param expected_values: label values to check, all values having
+     at least one of metrics are checked by default
+    :type expected_values: list
+    :returns: mapping of label value to set of missing metric names
+    :rtype: dict
+    """
+    present = collections.defaultdict(set)
+    for name, value in found:
+        present[value].add(name)
+    if expected_values is None:
+        expected_values = present.keys()
+    return {value: set(metric_names) - present[value]
+            for value in expected_values}
+
+
+class SeriesIndex(object):
+    """In-memory inverted index of series label sets.
+
+    Every (label, value) pair points to a posting list of ids of series
+    having it, so selection by several labels is an intersection of
+    the shortest posting lists instead of a scan of all series.
+    """
+
+    def __init__(self, series=()):
+        self.series = []
+        self.postings = collections.defaultdict(list)
+        for labels in series:
+            self.add(labels)
+
+    def __len__(self):
+        return len(self.series)
+
+    def add(self, labels):
+        series_id = len(self.series)
+        self.series.append(labels)
+        for item in labels.items():
+            self.postings[item].append(series_id)
+        return series_id
+
+    def _get_ids(self, label, value):
+        if isinstance(value, six.string_types):
+            return set(self.postings.get((label, value), ()))
+        ids = set()
+        for item in value:
+            ids.update(self.postings.get((label, item), ()))
+        return ids
+
+    def select_ids(self, **matchers):
+        """Return ids of series matching all given label values.
+
+        Matcher value can be a string or a collection of allowed values.
+        """
+        if not matchers:
+            return set(range(len(self.series)))
+        id_sets = sorted((self._get_ids(label, value)
+                          for label, value in matchers.items()), key=len)
+        result = id_sets[0]
+        for ids in id_sets[1:]:
+            if not result:
+                break
+            result &= ids
+        return result
+
+    def select(self, **matchers):
+        return [self.series[series_id]
+                for series_id in sorted(self.select_ids(**matchers))]
+
+    def has(self, **matchers):
+        return bool(self.select_ids(**matchers))
+
+    def label_values(self, label, **matchers):
+        """Return values of the label among series matching matchers."""
+        return {self.series[series_id][label]
+                for series_id in self.select_ids(**matchers)
+                if label in self.series[series_id]}
@@ -0,0 +1,94 @@
+import contextlib
+import threading
+import time
+import urlparse
+
+
+class TokenBucket(object):
+    """Allows "rate" calls per second with bursts up to "burst" calls."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1, rate))
+        self.tokens = self.capacity
+        self.updated_at = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, sleeping until it is available."""
+        with self._lock:
+            now = time.time()
+            self.tokens = min(
+                self.capacity,
+                self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            # Token is reserved even if it is not available yet,
+            # so waiting callers are served in order
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+
+class HostLimiter(object):
+    def __init__(self, max_concurrency=None, rate=None, burst=None):
+        self.semaphore = None
+        if max_concurrency:
+            self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.bucket = TokenBucket(rate, burst) if rate else None
+
+    @contextlib.contextmanager
+    def acquire(self):
+        """Wait for a free slot, yields time spent in the queue."""
+        start = time.time()
+        if self.bucket is not None:
+            self.bucket.acquire()
+        if self.semaphore is not None:
+            self.semaphore.acquire()
+        try:
+            yield time.time() - start
+        finally:
+            if self.semaphore is not None:
+                self.semaphore.release()
+
+
+class HostLimiterRegistry(object):
+    """Per-host limits of requests in flight and requests per second.
+
+    Hosts without configured limits are not limited.
+    """
+
+    def __init__(self):
+        self._limiters = {}
+
+    @staticmethod
+    def _get_host(url):
+        return urlparse.urlsplit(url).netloc.rpartition("@")[2]
+
+    def configure(self, url, max_concurrency=None, rate=None, burst=None):
+        """Set limits for host of the given URL.
+
+        :param max_concurrency: max number of requests in flight
+        :type max_concurrency: int
+        :param rate: max number of requests per second
+        :type rate: float
+        :param burst: max number of requests sent at once within rate
+        :type burst: int
+        """
+        host = self._get_host(url)
+        if max_concurrency or rate:
+            self._limiters[host] = HostLimiter(max_concurrency, rate, burst)
+        else:
+            self._limiters.pop(host, None)
+
+    @contextlib.contextmanager
+    def limit(self, url):
+        limiter = self._limiters.get(self._get_host(url))
+        if limiter is None:
+            yield 0.0
+            return
+        with limiter.acquire() as queue_wait:
+            yield queue_wait
+
+
+registry = HostLimiterRegistry()
@@ -1,6 +1,7 @@
 import cStringIO
 import logging
 import select
+import threading
 
 import paramiko
 
@@ -28,6 +29,8 @@ class SSHTransport(object):
         self.look_for_keys = look_for_keys
         self.buf_size = 1024
         self.channel_timeout = 10.0
+        self._ssh = None
+        self._lock = threading.Lock()
 
     def _get_ssh_connection(self):
         ssh = paramiko.SSHClient()
@@ -39,6 +42,31 @@ class SSHTransport(object):
         logger.debug("Successfully connected to: {0}".format(self.address))
         return ssh
 
+    def _get_tunnel_transport(self, reconnect=False):
+        """Return transport shared by HTTP requests tunneled to the host.
+
+        Keepalive packets make a dead connection (e.g. after reboot of
+        the host) noticed, it is replaced on the next request.
+        """
+        with self._lock:
+            if self._ssh is not None:
+                transport = self._ssh.get_transport()
+                if (not reconnect and transport is not None and
+                        transport.is_active()):
+                    return transport
+                self._ssh.close()
+                self._ssh = None
+            self._ssh = self._get_ssh_connection()
+            transport = self._ssh.get_transport()
+            transport.set_keepalive(int(self.channel_timeout))
+            return transport
+
+    def close(self):
+        with self._lock:
+            if self._ssh is not None:
+                self._ssh.close()
+                self._ssh = None
+
     def _get_sftp_connection(self):
         transport = paramiko.Transport((self.address, 22))
         transport.connect(username=self.username,
@@ -122,6 +150,77 @@ class SSHTransport(object):
                     host=self.address, stderr=stderr_str)
         return ret
 
+    def _open_tunnel(self, host, port):
+        try:
+            transport = self._get_tunnel_transport()
+            return transport.open_channel(
+                "direct-tcpip", (host, port), ("127.0.0.1", 0))
+        except paramiko.ChannelException:
+            raise
+        except (paramiko.SSHException, EOFError):
+            logger.debug("SSH connection to {0} is broken, "
+                         "reconnecting".format(self.address))
+            transport = self._get_tunnel_transport(reconnect=True)
+            return transport.open_channel(
+                "direct-tcpip", (host, port), ("127.0.0.1", 0))
+
+    def iter_http_get(self, port, path="/", host="127.0.0.1", timeout=60,
+                      chunk_size=64 * 1024):
+        """Yield body of HTTP GET response by chunks via SSH tunnel.
+
+        Request is sent from the remote host itself, so services listening
+        only on its local interfaces are reachable. If the host forbids
+        TCP forwarding, the request is made with curl on the host.
+        :param port: port of HTTP server on the remote host
+        :type port: int
+        :param path: URL path to request
+        :type path: str
+        :param host: address to connect to from the remote host
+        :type host: str
+        :raises: HTTPViaSSHFailed if response status is not 200
+        """
+        url = "{0}:{1}{2}".format(host, port, path)
+        try:
+            channel = self._open_tunnel(host, port)
+        except paramiko.ChannelException as e:
+            logger.debug("TCP forwarding to {0} via {1} failed: {2}, "
+                         "using curl".format(url, self.address, e))
+            exit_status, stdout, stderr = self.exec_sync(
+                "curl -s -S -f --max-time {0} http://{1}".format(
+                    timeout, url))
+            if exit_status != 0:
+                raise custom_exceptions.HTTPViaSSHFailed(
+                    host=self.address, url=url, status=stderr)
+            yield stdout
+            return
+
+        try:
+            channel.settimeout(timeout)
+            channel.sendall(
+                "GET {0} HTTP/1.0\r\nHost: {1}:{2}\r\n"
+                "Connection: close\r\n\r\n".format(path, host, port))
+            head = b""
+            while b"\r\n\r\n" not in head:
+                chunk = channel.recv(chunk_size)
+                if not chunk:
+                    break
+                head += chunk
+            head, _, body = head.partition(b"\r\n\r\n")
+            status_line = head.split(b"\r\n", 1)[0]
+            status = status_line.split(None, 2)[1:2]
+            if status != [b"200"]:
+                raise custom_exceptions.HTTPViaSSHFailed(
+                    host=self.address, url=url, status=status_line)
+            if body:
+                yield body
+            while True:
+                chunk = channel.recv(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            channel.close()
+
     def put_file(self, source_path, destination_path):
         sftp = self._get_sftp_connection()
         sftp.put(source_path, destination_path)
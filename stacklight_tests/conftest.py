@@ -1,7 +1,9 @@
 import logging
+import os
 
 import pytest
 
+from stacklight_tests.clients import http_stats
 from stacklight_tests import objects
 from stacklight_tests import settings
 from stacklight_tests import utils
@@ -28,6 +30,32 @@ def pytest_runtest_makereport(item):
 
     setattr(item, "rep_" + rep.when, rep)
 
+    if rep.when == "teardown":
+        http_stats.recorder.finish_test(item.nodeid)
+
+
+def pytest_sessionfinish(session):
+    logger.info("Shared HTTP sessions stats: {}".format(
+        utils.http_sessions.get_stats()))
+    utils.http_sessions.close()
+
+    if not http_stats.recorder.total:
+        return
+    http_stats.recorder.finish_test("<session>")
+    xml_path = getattr(session.config.option, "xmlpath", None)
+    report_dir = os.path.dirname(os.path.abspath(xml_path or "report.xml"))
+    stats_path = os.path.join(report_dir, "http_stats.json")
+    http_stats.recorder.dump(stats_path)
+    logger.info("HTTP stats saved to {}".format(stats_path))
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not http_stats.recorder.total:
+        return
+    terminalreporter.section("HTTP requests stats")
+    for line in http_stats.recorder.format_table():
+        terminalreporter.write_line(line)
+
 
 @pytest.fixture(scope="session")
 def env_config():
@@ -59,7 +87,8 @@ def cluster(nodes_config):
     current_cluster = objects.Cluster()
     for node_args in nodes_config:
         current_cluster.add_host(objects.Host(**node_args))
-    return current_cluster
+    yield current_cluster
+    current_cluster.close()
 
 
 @pytest.fixture(autouse=True)
@@ -36,5 +36,19 @@ class SSHCommandFailed(BaseCustomException):
                "%(stderr)s")
 
 
+class HTTPViaSSHFailed(BaseCustomException):
+    msg_fmt = ("Request to %(url)s via SSH tunnel to %(host)s failed: "
+               "%(status)s")
+
+
 class TimeoutError(BaseCustomException):
     pass
+
+
+class BackendUnavailable(BaseCustomException):
+    msg_fmt = ("Backend %(host)s is unavailable: %(failures)s consecutive "
+               "connection failures, next probe in %(retry_in)d seconds")
+
+
+class ExporterScrapeFailed(BaseCustomException):
+    msg_fmt = "Failed to scrape exporters on hosts: %(errors)s"
@@ -71,6 +71,11 @@ class Cluster(object):
     def get_random_compute(self):
         return random.choice(self.filter_by_role("compute"))
 
+    def close(self):
+        """Close SSH connections kept open to hosts."""
+        for host in self.hosts:
+            host.os.transport.close()
+
 
 class Host(object):
     def __init__(self, address, roles=None, *args, **kwargs):
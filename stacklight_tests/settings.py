@@ -19,3 +19,15 @@ CONFIGURE_APPS = ["nodes", "influxdb", "elasticsearch", "grafana",
                   "nagios", "keystone", "mysql", "prometheus"]
 
 VOLUME_STATUS = os.environ.get("VOLUME_STATUS", "error")
+
+# HTTP clients settings
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 10))
+CIRCUIT_BREAKER_FAILURES = int(os.environ.get("CIRCUIT_BREAKER_FAILURES", 3))
+CIRCUIT_BREAKER_RESET_TIMEOUT = float(
+    os.environ.get("CIRCUIT_BREAKER_RESET_TIMEOUT", 30))
+
+# Record Prometheus API traffic into the cassette or replay it from one
+PROMETHEUS_CASSETTE_RECORD = os.environ.get("PROMETHEUS_CASSETTE_RECORD")
+PROMETHEUS_CASSETTE_REPLAY = os.environ.get("PROMETHEUS_CASSETTE_REPLAY")
+PROMETHEUS_REPLAY_LATENCY = float(
+    os.environ.get("PROMETHEUS_REPLAY_LATENCY", 0))
@@ -89,13 +89,13 @@ class TestPrometheusAlerts(object):
     def test_system_load_alerts(self, cluster, prometheus_alerting):
         def check_status(is_fired=True):
             alert_names = ["SystemLoad5", "AvgCPUUsageIdle"]
-            for alert_name in alert_names:
-                criteria = {
-                    "name": alert_name,
-                    "host": compute.hostname,
-                }
-                prometheus_alerting.check_alert_status(
-                    criteria, is_fired=is_fired, timeout=6 * 60)
+            hostname = compute.hostname
+            expectations = {
+                (("name", alert_name), ("host", hostname)): is_fired
+                for alert_name in alert_names}
+            met_at = prometheus_alerting.wait_for_alert_states(
+                expectations, timeout=6 * 60)
+            logger.info("Alert states were observed at: {}".format(met_at))
 
         load_processes_count = 20
 
@@ -141,7 +141,7 @@ def dashboard_name(request, cluster):
 
 
 def test_grafana_dashboard_panel_queries(
-        dashboard_name, grafana_client, prometheus_api):
+        dashboard_name, grafana_client, prometheus_api, prometheus_query_memo):
 
     grafana_client.check_grafana_online()
     dashboard = grafana_client.get_dashboard(dashboard_name)
@@ -150,22 +150,31 @@ def test_grafana_dashboard_panel_queries(
         "Dashboard {name} is not present".format(name=dashboard_name)
 
     dashboard_results = collections.defaultdict(list)
+    panels = []
+    panel_queries = []
 
     for location, raw_query in dashboard.get_panel_queries().items():
         possible_templates = dashboard.get_all_templates_for_query(raw_query)
 
         panel = Panel(location, raw_query)
+        panels.append(panel)
 
         for template in possible_templates:
             query = prometheus_api.compile_query(raw_query, template)
-            try:
-                result = prometheus_api.do_query(query)
-                if not result:
-                    raise ValueError
-                panel.add_query(query, PanelStatus.ok)
-            except (KeyError, ValueError):
-                panel.add_query(query, PanelStatus.fail)
-
+            panel_queries.append((panel, query))
+
+    results = prometheus_api.query_many(
+        [query for _, query in panel_queries], memo=prometheus_query_memo)
+    for (panel, query), query_result in zip(panel_queries, results):
+        if query_result.error is None and query_result.result:
+            panel.add_query(query, PanelStatus.ok)
+        elif query_result.error is None or isinstance(
+                query_result.error, (KeyError, ValueError)):
+            panel.add_query(query, PanelStatus.fail)
+        else:
+            raise query_result.error
+
+    for panel in panels:
         dashboard_results[panel.status].append(panel)
 
     error_msg = (
@@ -1,6 +1,7 @@
 import logging
 import pytest
 
+from stacklight_tests.clients.prometheus import exporter_scrape
 from stacklight_tests import utils
 
 logger = logging.getLogger(__name__)
@@ -33,17 +34,6 @@ class TestMetrics(object):
                    'kernel_interrupts', 'kernel_processes_forked']
     }
 
-    def verify_notifications(self, prometheus_api, expected_list, query):
-            output = prometheus_api.get_query(query)
-            got_metrics = set([metric["metric"]["__name__"]
-                               for metric in output])
-            delta = set(expected_list) - got_metrics
-            if delta:
-                logger.info("{} metric(s) not found in {}".format(
-                    delta, got_metrics))
-                return False
-            return True
-
     def test_etcd_metrics(self, cluster, prometheus_api):
         nodes = cluster.filter_by_role("etcd")
         expected_hostnames = [node.address for node in nodes]
@@ -84,13 +74,22 @@ class TestMetrics(object):
                              ids=target_metrics.keys())
     def test_system_metrics(self, prometheus_api, cluster, target, metrics):
         expected_hostnames = [h.hostname for h in cluster.hosts]
-        for hostname in expected_hostnames:
-            q = ('{{__name__=~"^{}.*", host="{}"}}'.format(target, hostname))
-            logger.info("Waiting to get all metrics")
-            msg = "Timed out waiting to get all metrics"
-            utils.wait(
-                lambda: self.verify_notifications(prometheus_api, metrics, q),
-                timeout=5 * 60, interval=10, timeout_msg=msg)
+
+        def check():
+            federated = prometheus_api.federate_metrics(metrics)
+            missing = federated.missing_series(
+                metrics, by_label="host", expected_values=expected_hostnames)
+            missing = {host: names for host, names in missing.items()
+                       if names}
+            if missing:
+                logger.info("Metric(s) not found by host: {}".format(
+                    missing))
+                return False
+            return True
+
+        logger.info("Waiting to get all metrics")
+        msg = "Timed out waiting to get all metrics"
+        utils.wait(check, timeout=5 * 60, interval=10, timeout_msg=msg)
 
     def test_k8s_metrics(self, cluster, prometheus_api):
         nodes = cluster.filter_by_role("kubernetes")
@@ -103,12 +102,9 @@ class TestMetrics(object):
             'container_tasks_state'
         ]
 
-        for metric in metrics:
-            q = ('{{__name__=~"{}"}}'.format(metric))
-            output = prometheus_api.get_query(q)
-            logger.info("Waiting to get metric {}".format(metric))
-            msg = "Metric {} not found".format(metric)
-            assert len(output) != 0, msg
+        missing = prometheus_api.federate_metrics(metrics).missing_metrics(
+            metrics)
+        assert not missing, "Metric(s) {} not found".format(missing)
 
     def test_mysql_metrics(self, cluster):
         mysql_hosts = cluster.filter_by_role("galera")
@@ -149,13 +145,12 @@ class TestMetrics(object):
         for handler in handlers:
             expected_metrics.append("mysql_handler_{}".format(handler))
 
-        for host in mysql_hosts:
-            got_metrics = host.os.exec_command(
-                "curl -s localhost:9126/metrics | awk '/^mysql/{print $1}'")
-            hostname = host.hostname
-            for metric in expected_metrics:
-                metric = (metric + '{host="' + hostname +
-                          '",server="/var/run/mysqld/mysqld.sock"}')
-                err_msg = ("Metric {} not found in received list of mysql "
-                           "metrics on {} node".format(metric, hostname))
-                assert metric in got_metrics, err_msg
+        scraped = exporter_scrape.scrape_hosts(mysql_hosts, port=9126,
+                                               via="ssh")
+        for hostname, metrics in scraped.items():
+            missing = metrics.missing(
+                expected_metrics, host=hostname,
+                server="/var/run/mysqld/mysqld.sock")
+            err_msg = ("Metrics {} not found in received list of mysql "
+                       "metrics on {} node".format(missing, hostname))
+            assert not missing, err_msg
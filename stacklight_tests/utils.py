@@ -1,21 +1,104 @@
+import collections
 import datetime as dt
+import functools
+from multiprocessing import pool as mp_pool
 import os
 import random
 import tempfile
+import threading
 import time
+import urlparse
 
 import requests
 from requests.packages.urllib3 import poolmanager
 import yaml
 
+from stacklight_tests.clients import circuit_breaker
+from stacklight_tests.clients import http_cache
+from stacklight_tests.clients import http_client
+from stacklight_tests.clients import http_stats
 from stacklight_tests import custom_exceptions as exceptions
+from stacklight_tests import settings
 
 
-class TestHTTPAdapter(requests.adapters.HTTPAdapter):
+class TestHTTPAdapter(http_client.PooledHTTPAdapter):
     """Custom transport adapter to disable host checking in https requests."""
 
-    def init_poolmanager(self, connections, maxsize, block=False):
-        self.poolmanager = poolmanager.PoolManager(assert_hostname=False)
+    def init_poolmanager(self, connections, maxsize, block=False,
+                         **pool_kwargs):
+        self.poolmanager = poolmanager.PoolManager(
+            num_pools=connections, maxsize=maxsize, block=block,
+            assert_hostname=False, **pool_kwargs)
+        self.use_counting_pools()
+
+
+class SessionRegistry(object):
+    """Process-wide storage of pooled sessions.
+
+    Sessions are keyed by scheme, host, verify and auth, so every
+    check_http_get_response call to the same backend reuses keep-alive
+    connections instead of opening new ones.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self._sessions = {}
+        self._adapters = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(url, verify=None, auth=None):
+        parsed = urlparse.urlsplit(url)
+        if isinstance(auth, list):
+            auth = tuple(auth)
+        return parsed.scheme, parsed.netloc, verify, auth
+
+    def get_session(self, url, verify=None, auth=None):
+        key = self.make_key(url, verify, auth)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                adapter = TestHTTPAdapter(
+                    pool_connections=self.pool_connections,
+                    pool_maxsize=self.pool_maxsize)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.verify = verify
+                if auth is not None:
+                    session.auth = auth
+                self._sessions[key] = session
+                self._adapters[key] = adapter
+        return session
+
+    def get_stats(self):
+        """Return opened vs reused connections overall and per host."""
+        with self._lock:
+            adapters = list(self._adapters.items())
+        total = {"sessions": len(adapters), "connections_opened": 0,
+                 "requests": 0, "connections_reused": 0}
+        per_host = {}
+        for (scheme, netloc, _, _), adapter in adapters:
+            stats = adapter.get_pools_stats()
+            host = "{}://{}".format(scheme, netloc.rpartition("@")[2])
+            host_stats = per_host.setdefault(
+                host, dict.fromkeys(stats.keys(), 0))
+            for name, value in stats.items():
+                host_stats[name] += value
+                total[name] += value
+        total["hosts"] = per_host
+        return total
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._adapters.clear()
+
+
+http_sessions = SessionRegistry()
 
 
 def get_fixture(name, parent_dirs=("",), check_existence=True):
@@ -27,7 +110,15 @@ def get_fixture(name, parent_dirs=("",), check_existence=True):
     return path
 
 
-def wait(predicate, interval=5, timeout=60, timeout_msg="Waiting timed out"):
+def wait(predicate, interval=5, timeout=60, timeout_msg="Waiting timed out",
+         fresh=True):
+    """Wait until predicate returns True.
+
+    By default response caches are bypassed while predicate is checked,
+    pass fresh=False to allow cached responses.
+    """
+    if fresh:
+        predicate = _bypass_cache(predicate)
     start_time = time.time()
     if not timeout:
         return predicate()
@@ -43,6 +134,54 @@ def wait(predicate, interval=5, timeout=60, timeout_msg="Waiting timed out"):
     return timeout + start_time - time.time()
 
 
+ConcurrentResult = collections.namedtuple("ConcurrentResult",
+                                          ("result", "error"))
+
+
+def run_concurrently(func, items, concurrency=10):
+    """Call func for every item using at most "concurrency" threads.
+
+    Exceptions are not raised, they are returned per item instead.
+    :param func: callable which accepts single item
+    :type func: callable
+    :param items: arguments for func
+    :type items: iterable
+    :param concurrency: max number of simultaneous calls
+    :type concurrency: int
+    :returns: list of ConcurrentResult in the order of items
+    :rtype: list
+    """
+    items = list(items)
+    if not items:
+        return []
+    # Cache bypass is thread-local, workers should inherit it
+    bypassed = http_cache.is_bypassed()
+
+    def call(item):
+        try:
+            if bypassed:
+                with http_cache.bypass():
+                    return ConcurrentResult(func(item), None)
+            return ConcurrentResult(func(item), None)
+        except Exception as e:
+            return ConcurrentResult(None, e)
+
+    pool = mp_pool.ThreadPool(max(1, min(concurrency, len(items))))
+    try:
+        return pool.map(call, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _bypass_cache(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with http_cache.bypass():
+            return func(*args, **kwargs)
+    return wrapper
+
+
 def write_cert(cert_content):
     with tempfile.NamedTemporaryFile(
             prefix="ca_", suffix=".pem", delete=False) as f:
@@ -77,6 +216,16 @@ def topo_sort(graph_unsorted):
     return result_graph
 
 
+_root_ca_path = None
+
+
+def get_root_ca():
+    global _root_ca_path
+    if _root_ca_path is None:
+        _root_ca_path = get_fixture("rootCA.pem")
+    return _root_ca_path
+
+
 def load_config():
     with open(get_fixture("config.yaml")) as config_file:
         config = yaml.load(config_file)
@@ -86,6 +235,9 @@ def load_config():
 def check_http_get_response(url, expected_codes=(200,), msg=None, **kwargs):
     """Perform a HTTP GET request and assert that the HTTP server replies with
     the expected code.
+
+    Request is sent through a shared session from "http_sessions" registry,
+    so connections to the same host are kept alive between calls.
     :param url: the requested URL
     :type url: str
     :param expected_codes: the expected HTTP response codes. Defaults to 200
@@ -95,11 +247,14 @@ def check_http_get_response(url, expected_codes=(200,), msg=None, **kwargs):
     :returns: HTTP response object
     :rtype: requests.Response
     """
-    session = requests.Session()
-    session.mount("https://", TestHTTPAdapter())
-    cert = get_fixture("rootCA.pem")
+    auth = kwargs.pop("auth", None)
+    session = http_sessions.get_session(url, verify=get_root_ca(), auth=auth)
     msg = msg or "%s responded with {0}, expected {1}" % url
-    response = session.get(url, verify=cert, **kwargs)
+    kwargs.setdefault("timeout", (settings.HTTP_CONNECT_TIMEOUT, None))
+    response = circuit_breaker.registry.call(
+        url,
+        lambda: http_stats.recorder.measure(
+            url, lambda: session.get(url, **kwargs)))
     if expected_codes:
         assert response.status_code in expected_codes, msg.format(
             response.status_code, expected_codes)